@@ -179,10 +179,10 @@ class AuthComponent:
                 display_data = []
                 for invite in active_invites:
                     try:
-                        # Parse ISO string, handle potential errors
-                        expires_dt = datetime.datetime.fromisoformat(str(invite["expires_at"]))
+                        # expires_at is a unix epoch, handle potential errors
+                        expires_dt = datetime.datetime.fromtimestamp(invite["expires_at"])
                         expires_str = expires_dt.strftime("%Y-%m-%d %H:%M")
-                    except (ValueError, TypeError):
+                    except (ValueError, TypeError, OverflowError, OSError):
                         expires_str = "Invalid Date"
 
                     display_data.append({
@@ -3,6 +3,7 @@ Authentication module for AI Tutor application.
 Handles user authentication, invite-only signup, and subscription management.
 """
 import os
+import time
 import datetime
 import secrets
 import bcrypt
@@ -218,13 +219,11 @@ class AuthManager:
             Dictionary containing validation status and invite info if valid
         """
         conn = self.database.get_connection()
-        cursor = conn.cursor()
 
-        cursor.execute(
+        invite = conn.execute(
             "SELECT id, email, expires_at FROM invite_links WHERE token = ? AND used = 0",
             (token,)
-        )
-        invite = cursor.fetchone()
+        ).fetchone()
 
         if not invite:
             return {
@@ -232,34 +231,19 @@ class AuthManager:
                 "message": "Invalid or already used invite token."
             }
 
-        # Check if token is expired
+        # Check if token is expired (expires_at is stored as a unix epoch)
         try:
-            # Ensure expires_at is treated as a string before parsing
-            expires_at_str = invite["expires_at"]
-            if isinstance(expires_at_str, datetime.datetime):
-                 # If it's already a datetime object (less likely with sqlite3.Row but possible)
-                 expires_at = expires_at_str
-            else:
-                 expires_at = datetime.datetime.fromisoformat(str(expires_at_str))
-
-            # Make comparison timezone-aware if necessary, assuming UTC for now
-            if expires_at < datetime.datetime.now(): # Consider timezone if DB stores differently
+            if invite["expires_at"] <= int(time.time()): # Same rule as SQL_USE_INVITE (expires_at > now)
                 return {
                     "success": False,
                     "message": "Invite token has expired."
                 }
-        except ValueError:
-            return {
-                "success": False,
-                "message": "Invalid expiration date format for invite token."
-            }
         except TypeError:
              return {
                 "success": False,
                 "message": "Could not parse expiration date for invite token."
             }
 
-
         return {
             "success": True,
             "message": "Invite token is valid.",
@@ -2,11 +2,229 @@
 Database module for AI Tutor application.
 Sets up SQLite database for storing quiz results and user data.
 """
+import logging
 import os
 import sqlite3
-from typing import Dict, List, Any, Optional, Tuple
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Any, Optional, Set, Tuple, Iterable, Iterator
 import datetime
+import itertools
 import secrets
+import threading
+
+logger = logging.getLogger(__name__)
+
+# SQL statements are module-level constants so every call passes the same
+# string object and hits sqlite3's per-connection statement cache.
+SQL_INSERT_USER = "INSERT OR IGNORE INTO users (username, password_hash, email, is_admin) VALUES (?, ?, ?, ?) RETURNING id"
+USER_COLUMNS = "id, username, password_hash, email, created_at, subscription_active, subscription_expires, is_admin"
+SQL_GET_USER_BY_USERNAME = f"SELECT {USER_COLUMNS} FROM users WHERE username = ?"
+SQL_GET_USER_BY_ID = f"SELECT {USER_COLUMNS} FROM users WHERE id = ?"
+SQL_GET_USER_IS_ADMIN = "SELECT is_admin FROM users WHERE id = ?"
+SQL_COUNT_USERS = "SELECT COUNT(*) FROM users"
+SQL_INSERT_INVITE = "INSERT INTO invite_links (token, email, created_by, expires_at) VALUES (?, ?, ?, ?) RETURNING id"
+SQL_USE_INVITE = "UPDATE invite_links SET used = 1, used_by = ?, used_at = CURRENT_TIMESTAMP WHERE token = ? AND used = 0 AND expires_at > ?"
+SQL_GET_ACTIVE_INVITES_BY_CREATOR = "SELECT id, token, email, created_by, created_at, expires_at FROM invite_links WHERE created_by = ? AND used = 0 AND expires_at > ? ORDER BY created_at DESC"
+SQL_MIGRATE_INVITE_EXPIRY = "UPDATE invite_links SET expires_at = CAST(strftime('%s', expires_at, 'utc') AS INTEGER) WHERE typeof(expires_at) = 'text'"
+SQL_DELETE_INVITE = "DELETE FROM invite_links WHERE id = ?"
+SQL_INSERT_QUIZ = "INSERT INTO quizzes (title, source_material, created_by) VALUES (?, ?, ?) RETURNING id"
+SQL_INSERT_QUESTION = "INSERT INTO questions (quiz_id, question_text, question_type, correct_answer, options) VALUES (?, ?, ?, ?, ?) RETURNING id"
+SQL_BULK_INSERT_QUESTION = "INSERT INTO questions (quiz_id, question_text, question_type, correct_answer, options) VALUES (?, ?, ?, ?, ?)"
+SQL_INSERT_ATTEMPT = "INSERT INTO quiz_attempts (quiz_id, user_id) VALUES (?, ?) RETURNING id"
+SQL_COMPLETE_ATTEMPT = "UPDATE quiz_attempts SET completed_at = CURRENT_TIMESTAMP, score = ?, max_score = ? WHERE id = ?"
+SQL_INSERT_RESPONSE = "INSERT INTO question_responses (attempt_id, question_id, user_response, is_correct) VALUES (?, ?, ?, ?) RETURNING id"
+SQL_BULK_INSERT_RESPONSE = "INSERT INTO question_responses (attempt_id, question_id, user_response, is_correct) VALUES (?, ?, ?, ?)"
+SQL_INSERT_REPORT = "INSERT INTO progress_reports (user_id, title, report_path) VALUES (?, ?, ?) RETURNING id"
+SQL_UPDATE_REPORT_EMAIL = "UPDATE progress_reports SET emailed_to = ?, emailed_at = CURRENT_TIMESTAMP WHERE id = ?"
+SQL_GET_USER_REPORTS = "SELECT id, user_id, title, generated_at, report_path, emailed_to, emailed_at FROM progress_reports WHERE user_id = ? ORDER BY generated_at DESC"
+SQL_GET_ALL_USERS = "SELECT id, username, email, created_at, subscription_active, subscription_expires, is_admin FROM users ORDER BY created_at DESC"
+SQL_UPDATE_SUBSCRIPTION = "UPDATE users SET subscription_active = ?, subscription_expires = ? WHERE id = ?"
+SQL_LAST_INSERT_ROWID = "SELECT last_insert_rowid()"
+SQL_GET_QUIZ_WITH_QUESTIONS = """
+SELECT q.id, q.title, q.created_at, q.created_by,
+       qu.id AS question_id, qu.question_text, qu.question_type, qu.correct_answer, qu.options
+FROM quizzes q
+LEFT JOIN questions qu ON qu.quiz_id = q.id
+WHERE q.id = ?
+ORDER BY qu.id
+"""
+SQL_GET_QUIZ_WITH_QUESTIONS_AND_SOURCE = """
+SELECT q.id, q.title, q.source_material, q.created_at, q.created_by,
+       qu.id AS question_id, qu.question_text, qu.question_type, qu.correct_answer, qu.options
+FROM quizzes q
+LEFT JOIN questions qu ON qu.quiz_id = q.id
+WHERE q.id = ?
+ORDER BY qu.id
+"""
+SQL_GET_USER_QUIZ_HISTORY = """
+SELECT qa.id as attempt_id, q.title as quiz_title, qa.started_at, qa.completed_at, qa.score, qa.max_score
+FROM quiz_attempts qa
+JOIN quizzes q ON qa.quiz_id = q.id
+WHERE qa.user_id = ?
+ORDER BY qa.started_at DESC
+"""
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+# Bump whenever SQL_CREATE_SCHEMA changes
+SCHEMA_VERSION = 2
+
+SQL_CREATE_SCHEMA = f"""
+BEGIN;
+
+-- Create users table
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT UNIQUE NOT NULL,
+    password_hash TEXT NOT NULL,
+    email TEXT UNIQUE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    subscription_active BOOLEAN DEFAULT 0,
+    subscription_expires TIMESTAMP,
+    is_admin BOOLEAN DEFAULT 0
+);
+
+-- Create invite_links table
+CREATE TABLE IF NOT EXISTS invite_links (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    token TEXT UNIQUE NOT NULL,
+    email TEXT,
+    created_by INTEGER,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    expires_at INTEGER NOT NULL,  -- unix epoch seconds
+    used BOOLEAN DEFAULT 0,
+    used_by INTEGER,
+    used_at TIMESTAMP,
+    FOREIGN KEY (created_by) REFERENCES users (id),
+    FOREIGN KEY (used_by) REFERENCES users (id)
+);
+
+-- Create quizzes table
+CREATE TABLE IF NOT EXISTS quizzes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    title TEXT NOT NULL,
+    source_material TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    created_by INTEGER,
+    FOREIGN KEY (created_by) REFERENCES users (id)
+);
+
+-- Create questions table
+CREATE TABLE IF NOT EXISTS questions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    quiz_id INTEGER NOT NULL,
+    question_text TEXT NOT NULL,
+    question_type TEXT NOT NULL,  -- 'multiple_choice' or 'short_answer'
+    correct_answer TEXT,
+    options TEXT,  -- JSON string for multiple choice options
+    FOREIGN KEY (quiz_id) REFERENCES quizzes (id)
+);
+
+-- Create quiz_attempts table
+CREATE TABLE IF NOT EXISTS quiz_attempts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    quiz_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    completed_at TIMESTAMP,
+    score REAL,
+    max_score INTEGER,
+    FOREIGN KEY (quiz_id) REFERENCES quizzes (id),
+    FOREIGN KEY (user_id) REFERENCES users (id)
+);
+
+-- Create question_responses table
+CREATE TABLE IF NOT EXISTS question_responses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    attempt_id INTEGER NOT NULL,
+    question_id INTEGER NOT NULL,
+    user_response TEXT,
+    is_correct BOOLEAN,
+    FOREIGN KEY (attempt_id) REFERENCES quiz_attempts (id),
+    FOREIGN KEY (question_id) REFERENCES questions (id)
+);
+
+-- Create progress_reports table
+CREATE TABLE IF NOT EXISTS progress_reports (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    generated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    report_path TEXT,
+    emailed_to TEXT,
+    emailed_at TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users (id)
+);
+
+-- Indexes for hot lookups (username and token are already indexed via UNIQUE)
+CREATE INDEX IF NOT EXISTS idx_qattempts_user_started ON quiz_attempts (user_id, started_at DESC);
+CREATE INDEX IF NOT EXISTS idx_questions_quiz ON questions (quiz_id);
+CREATE INDEX IF NOT EXISTS idx_reports_user_gen ON progress_reports (user_id, generated_at DESC);
+CREATE INDEX IF NOT EXISTS idx_invites_creator_active ON invite_links (created_by, expires_at) WHERE used = 0;
+
+-- invite_links.expires_at used to hold local-time ISO strings (schema version < 2)
+{SQL_MIGRATE_INVITE_EXPIRY};
+
+PRAGMA user_version = {SCHEMA_VERSION};
+
+COMMIT;
+"""
+
+# Large enough to keep every statement above compiled for the connection's lifetime
+STATEMENT_CACHE_SIZE = 512
+
+# Rows bound per executemany() call in the bulk insert methods; 40-500 is the sweet spot
+BULK_BATCH_SIZE = 500
+
+# In-process user lookup cache: entries live at most USER_CACHE_TTL seconds
+USER_CACHE_SIZE = 1024
+USER_CACHE_TTL = 60.0
+
+class _TTLCache:
+    """
+    Small thread-safe LRU cache whose entries expire after a fixed TTL.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        """
+        Initialize the cache.
+
+        Args:
+            maxsize: Maximum number of entries before the least recently used is evicted
+            ttl: Lifetime of an entry in seconds
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Any, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Any) -> Any:
+        """Return the cached value for key, or None if missing or expired."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Any, value: Any) -> None:
+        """Store value under key, evicting the least recently used entry if full."""
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Any) -> None:
+        """Drop key from the cache if present."""
+        with self._lock:
+            self._data.pop(key, None)
 
 class Database:
     """
@@ -14,6 +232,9 @@ class Database:
     Uses SQLite for storing quiz results and user data.
     """
 
+    # Database files whose schema is known to be current in this process
+    _initialized_paths: Set[str] = set()
+
     def __init__(self, db_path: str = "ai_tutor.db"):
         """
         Initialize the database connection.
@@ -22,7 +243,15 @@ class Database:
             db_path: Path to the SQLite database file
         """
         self.db_path = db_path
+        # One connection per instance: a Database lives for a whole Streamlit session, while
+        # each rerun runs on a new thread, so per-thread connections would reopen every time
         self.conn = None
+        # Serializes writers on the shared connection (check_same_thread=False)
+        self._write_lock = threading.RLock()
+        # ("id", user_id) -> user dict, ("username", username) -> user_id
+        self._user_cache = _TTLCache(USER_CACHE_SIZE, USER_CACHE_TTL)
+        # user_id -> is_admin; admin status only changes through this class
+        self._admin_cache: Dict[int, bool] = {}
         self.initialize_db()
 
     def get_connection(self) -> sqlite3.Connection:
@@ -34,13 +263,86 @@ class Database:
         """
         if self.conn is None:
             try:
-                self.conn = sqlite3.connect(self.db_path, check_same_thread=False) # Added check_same_thread=False for Streamlit
+                # isolation_level=None: autocommit, transactions are managed explicitly
+                self.conn = sqlite3.connect(self.db_path, check_same_thread=False, # Added check_same_thread=False for Streamlit
+                                            isolation_level=None, cached_statements=STATEMENT_CACHE_SIZE)
                 self.conn.row_factory = sqlite3.Row  # Return rows as dictionaries
+                self._configure_connection(self.conn)
             except sqlite3.Error as e:
-                print(f"Database connection error: {e}")
+                logger.error("Database connection error: %s", e)
                 raise
         return self.conn
 
+    @staticmethod
+    def _configure_connection(conn: sqlite3.Connection) -> None:
+        """
+        Apply performance PRAGMAs to a freshly opened connection.
+
+        WAL lets readers proceed during writes and, with synchronous=NORMAL,
+        avoids an fsync on every commit.
+
+        Args:
+            conn: SQLite connection to configure
+        """
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-20000")  # ~20 MB page cache
+        conn.execute("PRAGMA mmap_size=268435456")  # 256 MB
+        conn.execute("PRAGMA foreign_keys=ON")
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Group several operations into a single transaction.
+
+        Issues BEGIN IMMEDIATE on entry, commits when the block succeeds and
+        rolls back if it raises. Nested calls join the outer transaction, so
+        e.g. a whole quiz attempt can be recorded with a single commit.
+
+        Yields:
+            SQLite connection object
+        """
+        conn = self.get_connection()
+        with self._write_lock:
+            if conn.in_transaction:
+                yield conn
+                return
+
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+
+    def _insert_bulk(self, sql: str, params: Iterable[Tuple], batch_size: int) -> Tuple[int, int]:
+        """
+        Run an INSERT for every parameter tuple inside one transaction.
+
+        Args:
+            sql: INSERT statement to execute
+            params: Parameter tuples, consumed lazily in chunks of batch_size
+            batch_size: Number of rows bound per executemany call
+
+        Returns:
+            Tuple of (last inserted row ID or -1 if none, number of rows inserted)
+        """
+        conn = self.get_connection()
+        params = iter(params)
+        inserted = 0
+
+        with self.transaction():
+            batch = list(itertools.islice(params, batch_size))
+            while batch:
+                inserted += conn.executemany(sql, batch).rowcount
+                batch = list(itertools.islice(params, batch_size))
+            # executemany() leaves lastrowid unset
+            last_id = conn.execute(SQL_LAST_INSERT_ROWID).fetchone()[0] if inserted else -1
+
+        return last_id, inserted
+
     def close_connection(self) -> None:
         """Close the database connection if it exists."""
         if self.conn:
@@ -48,109 +350,35 @@ class Database:
             self.conn = None
 
     def initialize_db(self) -> None:
-        """Create database tables if they don't exist."""
+        """
+        Create database tables if they don't exist.
+
+        The schema version is recorded in PRAGMA user_version, so an
+        up-to-date database is detected with a single PRAGMA read, and
+        skipped entirely once it has been checked in this process.
+        """
+        # In-memory databases are private to each connection and always need the DDL
+        path_key = None if self.db_path == ":memory:" else os.path.abspath(self.db_path)
+        if path_key in Database._initialized_paths:
+            return
+
         conn = self.get_connection()
-        cursor = conn.cursor()
-
-        # Create users table
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            email TEXT UNIQUE,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            subscription_active BOOLEAN DEFAULT 0,
-            subscription_expires TIMESTAMP,
-            is_admin BOOLEAN DEFAULT 0
-        )
-        """)
-
-        # Create invite_links table
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS invite_links (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            token TEXT UNIQUE NOT NULL,
-            email TEXT,
-            created_by INTEGER,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            expires_at TIMESTAMP NOT NULL,
-            used BOOLEAN DEFAULT 0,
-            used_by INTEGER,
-            used_at TIMESTAMP,
-            FOREIGN KEY (created_by) REFERENCES users (id),
-            FOREIGN KEY (used_by) REFERENCES users (id)
-        )
-        """)
-
-        # Create quizzes table
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS quizzes (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            source_material TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            created_by INTEGER,
-            FOREIGN KEY (created_by) REFERENCES users (id)
-        )
-        """)
-
-        # Create questions table
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS questions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            quiz_id INTEGER NOT NULL,
-            question_text TEXT NOT NULL,
-            question_type TEXT NOT NULL,  -- 'multiple_choice' or 'short_answer'
-            correct_answer TEXT,
-            options TEXT,  -- JSON string for multiple choice options
-            FOREIGN KEY (quiz_id) REFERENCES quizzes (id)
-        )
-        """)
-
-        # Create quiz_attempts table
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS quiz_attempts (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            quiz_id INTEGER NOT NULL,
-            user_id INTEGER NOT NULL,
-            started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            completed_at TIMESTAMP,
-            score REAL,
-            max_score INTEGER,
-            FOREIGN KEY (quiz_id) REFERENCES quizzes (id),
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        )
-        """)
-
-        # Create question_responses table
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS question_responses (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            attempt_id INTEGER NOT NULL,
-            question_id INTEGER NOT NULL,
-            user_response TEXT,
-            is_correct BOOLEAN,
-            FOREIGN KEY (attempt_id) REFERENCES quiz_attempts (id),
-            FOREIGN KEY (question_id) REFERENCES questions (id)
-        )
-        """)
-
-        # Create progress_reports table
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS progress_reports (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            title TEXT NOT NULL,
-            generated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            report_path TEXT,
-            emailed_to TEXT,
-            emailed_at TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        )
-        """)
-
-        conn.commit()
+        if conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION:
+            if path_key:
+                Database._initialized_paths.add(path_key)
+            return
+
+        # The whole DDL block is parsed once; it carries its own BEGIN/COMMIT
+        with self._write_lock:
+            try:
+                conn.executescript(SQL_CREATE_SCHEMA)
+            except sqlite3.Error:
+                if conn.in_transaction:
+                    conn.rollback()
+                raise
+
+        if path_key:
+            Database._initialized_paths.add(path_key)
 
     # User management methods
     def add_user(self, username: str, password_hash: str, email: Optional[str] = None, is_admin: bool = False) -> int:
@@ -167,19 +395,20 @@ class Database:
             User ID of the newly created user or -1 if integrity error
         """
         conn = self.get_connection()
-        cursor = conn.cursor()
 
-        try:
-            cursor.execute(
-                "INSERT INTO users (username, password_hash, email, is_admin) VALUES (?, ?, ?, ?)",
-                (username, password_hash, email, is_admin)
-            )
-            conn.commit()
-            return cursor.lastrowid
-        except sqlite3.IntegrityError:
-            # Username or email already exists
+        with self._write_lock:
+            row = conn.execute(SQL_INSERT_USER, (username, password_hash, email, is_admin)).fetchone()
+
+        if row is None:
+            # Username or email already exists (OR IGNORE returns no row)
             return -1
 
+        user_id = row[0]
+        self._user_cache.pop(("username", username))
+        # A negative admin check may have been memoized for this ID before it existed
+        self._admin_cache.pop(user_id, None)
+        return user_id
+
     def get_user_by_username(self, username: str) -> Optional[Dict]:
         """
         Get user information by username.
@@ -190,14 +419,18 @@ class Database:
         Returns:
             Dictionary containing user information or None if not found
         """
+        user_id = self._user_cache.get(("username", username))
+        if user_id is not None:
+            cached = self._user_cache.get(("id", user_id))
+            if cached is not None:
+                return dict(cached)
+
         conn = self.get_connection()
-        cursor = conn.cursor()
 
-        cursor.execute("SELECT * FROM users WHERE username = ?", (username,))
-        user = cursor.fetchone()
+        user = conn.execute(SQL_GET_USER_BY_USERNAME, (username,)).fetchone()
 
         if user:
-            return dict(user)
+            return self._cache_user(dict(user))
         return None
 
     def get_user_by_id(self, user_id: int) -> Optional[Dict]:
@@ -210,16 +443,40 @@ class Database:
         Returns:
             Dictionary containing user information or None if not found
         """
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        cached = self._user_cache.get(("id", user_id))
+        if cached is not None:
+            return dict(cached)
 
-        cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
-        user = cursor.fetchone()
+        user = self.get_connection().execute(SQL_GET_USER_BY_ID, (user_id,)).fetchone()
 
         if user:
-            return dict(user)
+            return self._cache_user(dict(user))
         return None
 
+    def _cache_user(self, user: Dict) -> Dict:
+        """
+        Store a user row in the lookup cache under its ID and username.
+
+        Args:
+            user: Dictionary containing user information
+
+        Returns:
+            A copy of the user dictionary that callers are free to mutate
+        """
+        self._user_cache.set(("id", user["id"]), user)
+        self._user_cache.set(("username", user["username"]), user["id"])
+        return dict(user)
+
+    def _invalidate_user(self, user_id: int) -> None:
+        """
+        Drop a user from the lookup cache after their row changes.
+
+        Args:
+            user_id: User's ID
+        """
+        self._user_cache.pop(("id", user_id))
+        self._admin_cache.pop(user_id, None)
+
     def is_user_admin(self, user_id: int) -> bool:
         """
         Check if a user is an administrator.
@@ -230,8 +487,14 @@ class Database:
         Returns:
             True if the user is an admin, False otherwise.
         """
-        user = self.get_user_by_id(user_id)
-        return user is not None and bool(user.get('is_admin', 0))
+        is_admin = self._admin_cache.get(user_id)
+        if is_admin is not None:
+            return is_admin
+
+        row = self.get_connection().execute(SQL_GET_USER_IS_ADMIN, (user_id,)).fetchone()
+        is_admin = row is not None and bool(row["is_admin"])
+        self._admin_cache[user_id] = is_admin
+        return is_admin
 
     def count_users(self) -> int:
         """
@@ -241,13 +504,11 @@ class Database:
             The total number of users.
         """
         conn = self.get_connection()
-        cursor = conn.cursor()
         try:
-            cursor.execute("SELECT COUNT(*) FROM users")
-            count = cursor.fetchone()[0]
+            count = conn.execute(SQL_COUNT_USERS).fetchone()[0]
             return count
-        except sqlite3.Error as e:
-            print(f"Database error in count_users: {e}")
+        except sqlite3.Error:
+            logger.exception("Database error in count_users")
             return 0 # Return 0 or raise error, depending on desired handling
 
     # Invite link methods
@@ -264,18 +525,14 @@ class Database:
             Tuple of (invite_id, token)
         """
         token = secrets.token_urlsafe(32)
-        expires_at = datetime.datetime.now() + datetime.timedelta(days=expires_in_days)
+        expires_at = int(time.time()) + expires_in_days * SECONDS_PER_DAY
 
         conn = self.get_connection()
-        cursor = conn.cursor()
 
-        cursor.execute(
-            "INSERT INTO invite_links (token, email, created_by, expires_at) VALUES (?, ?, ?, ?)",
-            (token, email, created_by, expires_at)
-        )
-        conn.commit()
+        with self._write_lock:
+            invite_id = conn.execute(SQL_INSERT_INVITE, (token, email, created_by, expires_at)).fetchone()[0]
 
-        return cursor.lastrowid, token
+        return invite_id, token
 
     def use_invite_link(self, token: str, user_id: int) -> bool:
         """
@@ -289,37 +546,12 @@ class Database:
             True if successful, False if token is invalid, expired, or already used
         """
         conn = self.get_connection()
-        cursor = conn.cursor()
 
-        # Check if token exists and is not used
-        cursor.execute(
-            "SELECT id, expires_at FROM invite_links WHERE token = ? AND used = 0",
-            (token,)
-        )
-        invite = cursor.fetchone()
+        # Mark as used only if the token exists, is unused and has not expired
+        with self._write_lock:
+            cursor = conn.execute(SQL_USE_INVITE, (user_id, token, int(time.time())))
 
-        if not invite:
-            return False
-
-        # Check if token is expired
-        invite_id = invite["id"]
-        try:
-            expires_at = datetime.datetime.fromisoformat(invite["expires_at"])
-        except ValueError:
-             # Handle cases where expires_at might not be in ISO format (though it should be)
-             return False
-
-        if expires_at < datetime.datetime.now():
-            return False
-
-        # Mark as used
-        cursor.execute(
-            "UPDATE invite_links SET used = 1, used_by = ?, used_at = CURRENT_TIMESTAMP WHERE id = ?",
-            (user_id, invite_id)
-        )
-        conn.commit()
-
-        return True
+        return cursor.rowcount > 0
 
     def get_active_invites_by_creator(self, creator_id: int) -> List[Dict]:
         """
@@ -332,14 +564,9 @@ class Database:
             List of dictionaries containing active invite link information
         """
         conn = self.get_connection()
-        cursor = conn.cursor()
-        now_iso = datetime.datetime.now().isoformat()
-
-        cursor.execute(
-            "SELECT * FROM invite_links WHERE created_by = ? AND used = 0 AND expires_at > ? ORDER BY created_at DESC",
-            (creator_id, now_iso)
-        )
-        invites = cursor.fetchall()
+        now = int(time.time())
+
+        invites = conn.execute(SQL_GET_ACTIVE_INVITES_BY_CREATOR, (creator_id, now)).fetchall()
         return [dict(invite) for invite in invites]
 
     # Quiz methods
@@ -356,15 +583,11 @@ class Database:
             Quiz ID of the newly created quiz
         """
         conn = self.get_connection()
-        cursor = conn.cursor()
 
-        cursor.execute(
-            "INSERT INTO quizzes (title, source_material, created_by) VALUES (?, ?, ?)",
-            (title, source_material, created_by)
-        )
-        conn.commit()
+        with self._write_lock:
+            quiz_id = conn.execute(SQL_INSERT_QUIZ, (title, source_material, created_by)).fetchone()[0]
 
-        return cursor.lastrowid
+        return quiz_id
 
     def add_question(self, quiz_id: int, question_text: str, question_type: str,
                     correct_answer: str, options: Optional[str] = None) -> int:
@@ -382,43 +605,64 @@ class Database:
             Question ID of the newly created question
         """
         conn = self.get_connection()
-        cursor = conn.cursor()
 
-        cursor.execute(
-            "INSERT INTO questions (quiz_id, question_text, question_type, correct_answer, options) VALUES (?, ?, ?, ?, ?)",
-            (quiz_id, question_text, question_type, correct_answer, options)
-        )
-        conn.commit()
+        with self._write_lock:
+            question_id = conn.execute(SQL_INSERT_QUESTION, (quiz_id, question_text, question_type, correct_answer, options)).fetchone()[0]
 
-        return cursor.lastrowid
+        return question_id
 
-    def get_quiz_with_questions(self, quiz_id: int) -> Optional[Dict]:
+    def add_questions_bulk(self, quiz_id: int, rows: Iterable[Tuple[str, str, str, Optional[str]]],
+                           batch_size: int = BULK_BATCH_SIZE) -> Tuple[int, int]:
+        """
+        Add many questions to a quiz in a single transaction.
+
+        Args:
+            quiz_id: Quiz ID
+            rows: (question_text, question_type, correct_answer, options) tuples
+            batch_size: Number of rows bound per executemany call
+
+        Returns:
+            Tuple of (ID of the last inserted question or -1 if none, number of questions inserted)
+        """
+        params = ((quiz_id,) + tuple(row) for row in rows)
+        return self._insert_bulk(SQL_BULK_INSERT_QUESTION, params, batch_size)
+
+    def get_quiz_with_questions(self, quiz_id: int, include_source: bool = False) -> Optional[Dict]:
         """
         Get a quiz with all its questions.
 
         Args:
             quiz_id: Quiz ID
+            include_source: Whether to also load the (potentially large) source material
 
         Returns:
             Dictionary containing quiz information and questions or None if not found
         """
         conn = self.get_connection()
-        cursor = conn.cursor()
 
-        # Get quiz information
-        cursor.execute("SELECT * FROM quizzes WHERE id = ?", (quiz_id,))
-        quiz = cursor.fetchone()
+        # One row per question (or a single row with NULL question columns if there are none)
+        sql = SQL_GET_QUIZ_WITH_QUESTIONS_AND_SOURCE if include_source else SQL_GET_QUIZ_WITH_QUESTIONS
+        rows = conn.execute(sql, (quiz_id,)).fetchall()
 
-        if not quiz:
+        if not rows:
             return None
 
-        quiz_dict = dict(quiz)
-
-        # Get questions
-        cursor.execute("SELECT * FROM questions WHERE quiz_id = ?", (quiz_id,))
-        questions = cursor.fetchall()
-
-        quiz_dict["questions"] = [dict(q) for q in questions]
+        columns = rows[0].keys()
+        split = columns.index("question_id")
+        quiz_dict = {key: rows[0][key] for key in columns[:split]}
+
+        quiz_dict["questions"] = [
+            {
+                "id": row["question_id"],
+                "quiz_id": quiz_dict["id"],
+                "question_text": row["question_text"],
+                "question_type": row["question_type"],
+                "correct_answer": row["correct_answer"],
+                "options": row["options"],
+            }
+            for row in rows
+            if row["question_id"] is not None
+        ]
 
         return quiz_dict
 
@@ -435,15 +679,11 @@ class Database:
             Attempt ID of the newly created attempt
         """
         conn = self.get_connection()
-        cursor = conn.cursor()
 
-        cursor.execute(
-            "INSERT INTO quiz_attempts (quiz_id, user_id) VALUES (?, ?)",
-            (quiz_id, user_id)
-        )
-        conn.commit()
+        with self._write_lock:
+            attempt_id = conn.execute(SQL_INSERT_ATTEMPT, (quiz_id, user_id)).fetchone()[0]
 
-        return cursor.lastrowid
+        return attempt_id
 
     def record_question_response(self, attempt_id: int, question_id: int,
                                 user_response: str, is_correct: bool) -> int:
@@ -460,15 +700,27 @@ class Database:
             Response ID of the newly created response
         """
         conn = self.get_connection()
-        cursor = conn.cursor()
 
-        cursor.execute(
-            "INSERT INTO question_responses (attempt_id, question_id, user_response, is_correct) VALUES (?, ?, ?, ?)",
-            (attempt_id, question_id, user_response, is_correct)
-        )
-        conn.commit()
+        with self._write_lock:
+            response_id = conn.execute(SQL_INSERT_RESPONSE, (attempt_id, question_id, user_response, is_correct)).fetchone()[0]
 
-        return cursor.lastrowid
+        return response_id
+
+    def record_question_responses_bulk(self, attempt_id: int, rows: Iterable[Tuple[int, str, bool]],
+                                       batch_size: int = BULK_BATCH_SIZE) -> Tuple[int, int]:
+        """
+        Record many responses for a quiz attempt in a single transaction.
+
+        Args:
+            attempt_id: Attempt ID
+            rows: (question_id, user_response, is_correct) tuples
+            batch_size: Number of rows bound per executemany call
+
+        Returns:
+            Tuple of (ID of the last inserted response or -1 if none, number of responses inserted)
+        """
+        params = ((attempt_id,) + tuple(row) for row in rows)
+        return self._insert_bulk(SQL_BULK_INSERT_RESPONSE, params, batch_size)
 
     def complete_quiz_attempt(self, attempt_id: int, score: float, max_score: int) -> bool:
         """
@@ -483,13 +735,9 @@ class Database:
             True if successful
         """
         conn = self.get_connection()
-        cursor = conn.cursor()
 
-        cursor.execute(
-            "UPDATE quiz_attempts SET completed_at = CURRENT_TIMESTAMP, score = ?, max_score = ? WHERE id = ?",
-            (score, max_score, attempt_id)
-        )
-        conn.commit()
+        with self._write_lock:
+            conn.execute(SQL_COMPLETE_ATTEMPT, (score, max_score, attempt_id))
 
         return True
 
@@ -507,15 +755,11 @@ class Database:
             Report ID of the newly created report
         """
         conn = self.get_connection()
-        cursor = conn.cursor()
 
-        cursor.execute(
-            "INSERT INTO progress_reports (user_id, title, report_path) VALUES (?, ?, ?)",
-            (user_id, title, report_path)
-        )
-        conn.commit()
+        with self._write_lock:
+            report_id = conn.execute(SQL_INSERT_REPORT, (user_id, title, report_path)).fetchone()[0]
 
-        return cursor.lastrowid
+        return report_id
 
     def update_report_email_status(self, report_id: int, emailed_to: str) -> bool:
         """
@@ -529,17 +773,13 @@ class Database:
             True if successful
         """
         conn = self.get_connection()
-        cursor = conn.cursor()
 
         try:
-            cursor.execute(
-                "UPDATE progress_reports SET emailed_to = ?, emailed_at = CURRENT_TIMESTAMP WHERE id = ?",
-                (emailed_to, report_id)
-            )
-            conn.commit()
+            with self._write_lock:
+                conn.execute(SQL_UPDATE_REPORT_EMAIL, (emailed_to, report_id))
             return True
-        except sqlite3.Error as e:
-            print(f"Database error in update_report_email_status: {e}")
+        except sqlite3.Error:
+            logger.exception("Database error in update_report_email_status")
             return False
 
     def get_user_quiz_history(self, user_id: int) -> List[Dict]:
@@ -553,19 +793,8 @@ class Database:
             List of dictionaries containing quiz attempt information
         """
         conn = self.get_connection()
-        cursor = conn.cursor()
-
-        cursor.execute(
-            """
-            SELECT qa.id as attempt_id, q.title as quiz_title, qa.started_at, qa.completed_at, qa.score, qa.max_score
-            FROM quiz_attempts qa
-            JOIN quizzes q ON qa.quiz_id = q.id
-            WHERE qa.user_id = ?
-            ORDER BY qa.started_at DESC
-            """,
-            (user_id,)
-        )
-        attempts = cursor.fetchall()
+
+        attempts = conn.execute(SQL_GET_USER_QUIZ_HISTORY, (user_id,)).fetchall()
         return [dict(attempt) for attempt in attempts]
 
     def get_user_progress_reports(self, user_id: int) -> List[Dict]:
@@ -579,27 +808,22 @@ class Database:
             List of dictionaries containing progress report information
         """
         conn = self.get_connection()
-        cursor = conn.cursor()
 
-        cursor.execute(
-            "SELECT * FROM progress_reports WHERE user_id = ? ORDER BY generated_at DESC",
-            (user_id,)
-        )
-        reports = cursor.fetchall()
+        reports = conn.execute(SQL_GET_USER_REPORTS, (user_id,)).fetchall()
         return [dict(report) for report in reports]
 
-    def get_all_users(self) -> List[Dict]:
+    def get_all_users(self) -> Iterator[Dict]:
         """
         Get all users from the database (for admin purposes).
 
+        Rows are streamed from the cursor, so the result can only be iterated
+        once; wrap it in list() if it is needed more than once.
+
         Returns:
-            List of dictionaries containing user information.
+            Iterator of dictionaries containing user information.
         """
         conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, username, email, created_at, subscription_active, subscription_expires, is_admin FROM users ORDER BY created_at DESC")
-        users = cursor.fetchall()
-        return [dict(user) for user in users]
+        return (dict(user) for user in conn.execute(SQL_GET_ALL_USERS))
 
     def update_user_subscription(self, user_id: int, subscription_active: bool, subscription_expires: Optional[datetime.datetime] = None) -> bool:
         """
@@ -614,16 +838,13 @@ class Database:
             True if successful, False otherwise.
         """
         conn = self.get_connection()
-        cursor = conn.cursor()
         try:
-            cursor.execute(
-                "UPDATE users SET subscription_active = ?, subscription_expires = ? WHERE id = ?",
-                (subscription_active, subscription_expires, user_id)
-            )
-            conn.commit()
+            with self._write_lock:
+                conn.execute(SQL_UPDATE_SUBSCRIPTION, (subscription_active, subscription_expires, user_id))
+            self._invalidate_user(user_id)
             return True
-        except sqlite3.Error as e:
-            print(f"Database error updating user subscription: {e}")
+        except sqlite3.Error:
+            logger.exception("Database error updating user subscription")
             return False
 
     def delete_invite_link(self, invite_id: int) -> bool:
@@ -637,13 +858,12 @@ class Database:
             True if successful, False otherwise.
         """
         conn = self.get_connection()
-        cursor = conn.cursor()
         try:
-            cursor.execute("DELETE FROM invite_links WHERE id = ?", (invite_id,))
-            conn.commit()
+            with self._write_lock:
+                cursor = conn.execute(SQL_DELETE_INVITE, (invite_id,))
             return cursor.rowcount > 0 # Check if any row was deleted
-        except sqlite3.Error as e:
-            print(f"Database error deleting invite link: {e}")
+        except sqlite3.Error:
+            logger.exception("Database error deleting invite link")
             return False
 
 # Example usage (optional, for testing)
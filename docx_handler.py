@@ -3,10 +3,19 @@ Placeholder for DOCXHandler module.
 """
 import os
 
+from upload_utils import TEXT_CACHE_SIZE, TextCache, claim_shared_file, content_digest, digest_filename
+
 class DOCXHandler:
+    # Content digest -> extracted text, shared across instances (Streamlit recreates handlers)
+    _text_cache = TextCache(TEXT_CACHE_SIZE)
+    # Upload folders already created in this process
+    _ensured: set[str] = set()
+
     def __init__(self, upload_folder: str):
         self.upload_folder = upload_folder
-        os.makedirs(self.upload_folder, exist_ok=True)
+        if self.upload_folder not in self._ensured:
+            os.makedirs(self.upload_folder, exist_ok=True)
+            self._ensured.add(self.upload_folder)
 
     def process_docx(self, file, filename: str) -> tuple[str, str | None]:
         """Placeholder for processing a DOCX file."""
@@ -14,14 +23,21 @@ class DOCXHandler:
         # Simulate saving the file
         file_path = os.path.join(self.upload_folder, filename)
         try:
-            with open(file_path, "wb") as f:
-                if hasattr(file, "read"):
-                    f.write(file.read())
-                else:
-                    pass # Placeholder
-            print(f"Placeholder: Saved DOCX to {file_path}")
+            # Identical uploads share one content-addressed file and its extracted text
+            digest = content_digest(file)
+            file_path = os.path.join(self.upload_folder, digest_filename(digest, filename))
+            # Counts this listing's reference; the file is released when the listing is removed
+            if claim_shared_file(file, file_path):
+                print(f"Placeholder: Saved DOCX to {file_path}")
+            else:
+                print(f"Placeholder: Reusing identical DOCX at {file_path}")
+            cached_text = self._text_cache.get(digest)
+            if cached_text is not None:
+                return file_path, cached_text
         except Exception as e:
             print(f"Placeholder: Error saving DOCX {filename}: {e}")
             return file_path, f"Error saving placeholder DOCX: {e}"
-        return file_path, "Placeholder: Extracted text from DOCX."
+        extracted_text = "Placeholder: Extracted text from DOCX."
+        self._text_cache.set(digest, extracted_text)
+        return file_path, extracted_text
 
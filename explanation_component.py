@@ -100,7 +100,7 @@ class ExplanationComponent:
             # Check if the TTS component is available in session state (initialized in streamlit_app.py)
             if 'tts_component' in st.session_state:
                 # Call the TTS component's render method, passing the current explanation text and source
-                st.session_state.tts_component.render_audio_player(
+                st.session_state.tts_component.render_audio_player_for_explanation(
                     text=st.session_state.current_explanation['text'], 
                     source=st.session_state.current_explanation['source']
                 )
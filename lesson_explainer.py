@@ -1,20 +1,91 @@
 #!/usr/bin/env python
 # coding: utf-8
 import re
-from typing import Dict, Any, List, Optional
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
 import random # Added for simulating variability
 
+try:
+    import ahocorasick # Optional: single-pass keyword matching for subject detection
+except ImportError:
+    ahocorasick = None
+
+# Preprocessing patterns, compiled once at import time
+_RE_NL = re.compile(r"\n{3,}")
+_RE_SP = re.compile(r" {2,}")
+_RE_PAGE = re.compile(r"^\s*Page \d+\s*$", re.MULTILINE)
+_RE_CHAP = re.compile(r"^\s*Chapter \d+\s*$", re.MULTILINE)
+# Noise lines: 1-5 visible characters once stripped (blank lines are kept), with their newline
+_RE_SHORT_LINE = re.compile(r"^[^\S\n]*\S(?:[^\n]{0,3}\S)?[^\S\n]*(?:\n|$)", re.MULTILINE)
+# Sentence boundaries: a run of terminal punctuation followed by whitespace
+_SENT_SPLIT = re.compile(r"[.!?]+\s+")
+# Common OCR ligatures mapped back to plain letters
+_LIGATURES = str.maketrans({"ﬁ": "fi", "ﬂ": "fl"})
+# Number of recent texts whose paragraph/sentence segmentation is kept
+SEGMENT_CACHE_SIZE = 4
+# Number of recent texts whose content-based subject is kept
+SUBJECT_CACHE_SIZE = 16
+# Seeded generator for picking excerpts, so runs are reproducible
+_rng = random.Random(0)
+
+# Content keywords per subject, in priority order (earlier subjects win ties)
+_SUBJECT_KEYWORDS = (
+    ("mathematics", ("ratio", "equation", "formula", "calculation", "algebra", "geometry", "solve for x", "fraction", "decimal", "percent", "theorem", "proof", "variable", "constant", "graph", "function")),
+    ("history", ("history", "century", "war", "civilization", "ancient", "revolution", "president", "king", "queen", "empire", "dynasty", "treaty", "primary source", "secondary source")),
+    ("science", ("science", "biology", "chemistry", "physics", "experiment", "molecule", "atom", "cell", "energy", "force", "hypothesis", "theory", "observation", "result", "method", "organism", "ecosystem")),
+    ("literature", ("literature", "novel", "poem", "author", "character", "story", "theme", "metaphor", "symbolism", "narrative", "plot", "setting", "protagonist", "antagonist")),
+    ("language", ("grammar", "vocabulary", "language", "verb", "noun", "adjective", "sentence", "paragraph", "syntax", "semantics", "phonetics", "linguistics")),
+)
+
+def _pick_indices(count: int, k: int):
+    """
+    Choose up to k distinct indices out of range(count), in ascending order.
+
+    Args:
+        count: Number of available items.
+        k: Number of items wanted.
+
+    Returns:
+        All indices when there are no more than k items, otherwise a sorted random subset.
+    """
+    if count <= k:
+        return range(count)
+    return sorted(_rng.sample(range(count), k))
+
+def _split_segments(pieces: List[str], min_length: int) -> List[str]:
+    """
+    Strip split fragments (once each) and keep those longer than min_length.
+
+    Args:
+        pieces: Raw fragments from str.split / re.split.
+        min_length: Fragments of this many characters or fewer are dropped.
+
+    Returns:
+        Stripped fragments, in their original order.
+    """
+    return [piece for piece in map(str.strip, pieces) if len(piece) > min_length]
+
 class LessonExplainer:
     """
     Generates explanations for educational content in a conversational, teacher-like style,
     attempting to base explanations more directly on the provided text content.
     """
 
+    # One explainer lives in each session; slots keep instances small
+    __slots__ = ("MAX_TEXT_CHARS_FOR_EXPLANATION", "_seg_cache", "_subject_cache")
+
+    # Keyword automaton shared by all instances, built on first use
+    _automaton = None
+
     def __init__(self):
         """Initialize the lesson explainer."""
         # Define a maximum character limit to avoid overly long explanations for very large documents
         self.MAX_TEXT_CHARS_FOR_EXPLANATION = 15000 # Increased limit slightly (~2500 words)
-        pass
+        # Processed text -> (paragraphs, sentences); re-explaining the same material at
+        # another complexity level reuses the segmentation
+        self._seg_cache: "OrderedDict[str, Tuple[List[str], List[str]]]" = OrderedDict()
+        # Processed text -> subject detected from its content
+        self._subject_cache: "OrderedDict[str, str]" = OrderedDict()
 
     def generate_explanation(self, text: str, complexity_level: str = "medium", source_filename: Optional[str] = None) -> str:
         """
@@ -68,21 +139,43 @@ class LessonExplainer:
             Preprocessed text.
         """
         # Replace multiple newlines with a single newline
-        text = re.sub(r"\n{3,}", "\n\n", text)
+        text = _RE_NL.sub("\n\n", text)
         # Replace multiple spaces with a single space
-        text = re.sub(r" {2,}", " ", text)
+        text = _RE_SP.sub(" ", text)
         # Attempt to fix common OCR issues like ligatures or misinterpretations
-        text = text.replace("ﬁ", "fi").replace("ﬂ", "fl")
+        text = text.translate(_LIGATURES)
         # Remove page numbers or headers/footers if possible (simple example)
-        text = re.sub(r"^\s*Page \d+\s*$", "", text, flags=re.MULTILINE)
-        text = re.sub(r"^\s*Chapter \d+\s*$", "", text, flags=re.MULTILINE)
+        text = _RE_PAGE.sub("", text)
+        text = _RE_CHAP.sub("", text)
         # Remove lines that seem like just noise (e.g., single characters, short fragments)
-        lines = text.split("\n")
-        cleaned_lines = [line for line in lines if len(line.strip()) > 5 or line.strip() == ""]
-        text = "\n".join(cleaned_lines)
+        text = _RE_SHORT_LINE.sub("", text)
 
         return text.strip()
 
+    def _segment(self, text: str) -> Tuple[List[str], List[str]]:
+        """
+        Split text into key paragraphs and sentences, memoized for recently seen texts.
+
+        Args:
+            text: Preprocessed text.
+
+        Returns:
+            Tuple (paragraphs longer than 50 chars, sentences longer than 30 chars).
+        """
+        segments = self._seg_cache.get(text)
+        if segments is not None:
+            self._seg_cache.move_to_end(text)
+            return segments
+
+        segments = (
+            _split_segments(text.split("\n\n"), 50), # Consider paragraphs > 50 chars
+            _split_segments(_SENT_SPLIT.split(text), 30), # Consider sentences > 30 chars
+        )
+        self._seg_cache[text] = segments
+        if len(self._seg_cache) > SEGMENT_CACHE_SIZE:
+            self._seg_cache.popitem(last=False)
+        return segments
+
     def _identify_subject(self, text: str, source_filename: Optional[str] = None) -> str:
         """
         Attempt to identify the subject matter of the text, using filename as a hint.
@@ -94,7 +187,6 @@ class LessonExplainer:
         Returns:
             Identified subject or "general" if unclear.
         """
-        text_lower = text.lower()
         filename_lower = source_filename.lower() if source_filename else ""
 
         # Prioritize filename hints
@@ -109,19 +201,65 @@ class LessonExplainer:
         if "language" in filename_lower or "grammar" in filename_lower or "vocabulary" in filename_lower:
             return "language"
 
-        # Fallback to text content analysis - expanded keywords
-        if any(term in text_lower for term in ["ratio", "equation", "formula", "calculation", "algebra", "geometry", "solve for x", "fraction", "decimal", "percent", "theorem", "proof", "variable", "constant", "graph", "function"]):
-            return "mathematics"
-        if any(term in text_lower for term in ["history", "century", "war", "civilization", "ancient", "revolution", "president", "king", "queen", "empire", "dynasty", "treaty", "primary source", "secondary source"]):
-            return "history"
-        if any(term in text_lower for term in ["science", "biology", "chemistry", "physics", "experiment", "molecule", "atom", "cell", "energy", "force", "hypothesis", "theory", "observation", "result", "method", "organism", "ecosystem"]):
-            return "science"
-        if any(term in text_lower for term in ["literature", "novel", "poem", "author", "character", "story", "theme", "metaphor", "symbolism", "narrative", "plot", "setting", "protagonist", "antagonist"]):
-            return "literature"
-        if any(term in text_lower for term in ["grammar", "vocabulary", "language", "verb", "noun", "adjective", "sentence", "paragraph", "syntax", "semantics", "phonetics", "linguistics"]):
-            return "language"
+        # Fallback to text content analysis, memoized so re-explaining the same
+        # material at another complexity level skips the lowercase-and-scan
+        subject = self._subject_cache.get(text)
+        if subject is not None:
+            self._subject_cache.move_to_end(text)
+            return subject
+
+        subject = self._subject_from_content(text.lower())
+        self._subject_cache[text] = subject
+        if len(self._subject_cache) > SUBJECT_CACHE_SIZE:
+            self._subject_cache.popitem(last=False)
+        return subject
+
+    def _subject_from_content(self, text_lower: str) -> str:
+        """
+        Identify the subject from keywords in the (lowercased) text.
 
-        return "general"
+        Args:
+            text_lower: Lowercased text content.
+
+        Returns:
+            Identified subject or "general" if no keyword matches.
+        """
+        automaton = self._subject_automaton()
+        if automaton is None:
+            for subject, terms in _SUBJECT_KEYWORDS:
+                if any(term in text_lower for term in terms):
+                    return subject
+            return "general"
+
+        # Scan the text once; keep the highest-priority subject seen so far
+        best = len(_SUBJECT_KEYWORDS)
+        for _, priority in automaton.iter(text_lower):
+            if priority < best:
+                best = priority
+                if best == 0:
+                    break
+        return _SUBJECT_KEYWORDS[best][0] if best < len(_SUBJECT_KEYWORDS) else "general"
+
+    @classmethod
+    def _subject_automaton(cls):
+        """
+        Build (once per process) the Aho-Corasick automaton over all subject keywords.
+
+        Returns:
+            Automaton mapping each keyword to its subject priority, or None if
+            pyahocorasick is not installed.
+        """
+        if ahocorasick is None:
+            return None
+        if cls._automaton is None:
+            automaton = ahocorasick.Automaton()
+            for priority, (_, terms) in enumerate(_SUBJECT_KEYWORDS):
+                for term in terms:
+                    if term not in automaton:
+                        automaton.add_word(term, priority)
+            automaton.make_automaton()
+            cls._automaton = automaton
+        return cls._automaton
 
     def _generate_teacher_explanation(self, text: str, subject: str) -> str:
         """
@@ -147,12 +285,11 @@ class LessonExplainer:
 
         # Simulate extracting key points/paragraphs from the *entire* text (up to the limit)
         # Split into potential paragraphs first
-        paragraphs = [p.strip() for p in text.split("\n\n") if len(p.strip()) > 50] # Consider paragraphs > 50 chars
+        paragraphs, sentences = self._segment(text)
         
         # If few paragraphs, split by sentences
         if len(paragraphs) < 3:
-            sentences = re.split(r"[.!?]+\s+", text) # Split by sentence endings
-            key_items = [s.strip() for s in sentences if len(s.strip()) > 30] # Consider sentences > 30 chars
+            key_items = sentences
             item_type = "sentence"
         else:
             key_items = paragraphs
@@ -165,7 +302,7 @@ class LessonExplainer:
         else:
              body = f"Let's focus on some key parts from the text. I've picked out {num_items_to_discuss} important {'paragraphs' if item_type == 'paragraph' else 'sentences'} to discuss:\n\n"
              # Select a few items randomly or sequentially to discuss
-             indices_to_discuss = random.sample(range(len(key_items)), k=num_items_to_discuss) if len(key_items) > num_items_to_discuss else range(num_items_to_discuss)
+             indices_to_discuss = _pick_indices(len(key_items), num_items_to_discuss)
              
              for i, index in enumerate(indices_to_discuss):
                  item = key_items[index]
@@ -207,7 +344,7 @@ class LessonExplainer:
         (Placeholder - less detailed than teacher explanation)
         """
         # Process a smaller portion for simple explanation
-        sentences = re.split(r"[.!?]+\s+", text)
+        sentences = _SENT_SPLIT.split(text, maxsplit=1) # Only the first sentence is used
         first_sentence = sentences[0].strip() if sentences else ""
         explanation = f"Hi there! Let's look at this {subject} topic. The first sentence says: '{first_sentence}'. It's basically saying that... [Simplified summary]. For example, think about... [Simple analogy]. Does that help a bit?"
         return explanation
@@ -218,11 +355,11 @@ class LessonExplainer:
         (Placeholder - more formal than teacher explanation)
         """
         # Process more text for advanced explanation
-        paragraphs = [p.strip() for p in text.split("\n\n") if len(p.strip()) > 50]
+        paragraphs, _ = self._segment(text)
         key_concepts = []
         num_concepts = min(len(paragraphs), 3)
         if num_concepts > 0:
-             indices = random.sample(range(len(paragraphs)), k=num_concepts) if len(paragraphs) > num_concepts else range(num_concepts)
+             indices = _pick_indices(len(paragraphs), num_concepts)
              for i, index in enumerate(indices):
                  para = paragraphs[index]
                  key_concepts.append(f"[Inferred Key Concept {i+1} from paragraph starting '{para[:50]}...']" )
@@ -2,18 +2,108 @@
 # coding: utf-8
 """
 PDF upload and text extraction module for AI Tutor application.
-Handles PDF files and extracts text using PyPDF2 and poppler-utils.
+Handles PDF files and extracts text using PDFium (if installed), poppler-utils and PyPDF2.
 Aims to extract text from the entire document.
 """
+import hashlib
+import logging
+import multiprocessing
 import os
 import subprocess
 import tempfile
-from typing import Tuple, Optional
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import suppress
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterable, List, Tuple, Optional
 import PyPDF2
 
+try:
+    import pypdfium2 as pdfium # Optional: PDFium (C++) extraction, much faster than PyPDF2
+except ImportError:
+    pdfium = None
+
+from upload_utils import COPY_BUFFER_SIZE, DIGEST_ALGORITHM
+
+logger = logging.getLogger(__name__)
+
+# PDFium is not thread-safe, even across different documents, and Streamlit serves each
+# session on its own thread, so every pypdfium2 call goes through this lock
+_PDFIUM_LOCK = threading.Lock()
+
+# PDFs with at least this many pages have their pages extracted in parallel
+PARALLEL_PAGE_THRESHOLD = 16
+# Upper bound on worker processes used for page extraction, across all sessions
+MAX_EXTRACT_WORKERS = min(8, os.cpu_count() or 1)
+
+# One page-extraction pool for the whole process, created on first use. Workers are
+# spawned rather than forked: forking a threaded server (Streamlit) can deadlock the child.
+_extract_pool: Optional[ProcessPoolExecutor] = None
+_extract_pool_lock = threading.Lock()
+
+# Seconds to wait for pdftotext before giving up
+PDFTOTEXT_TIMEOUT = 60
+
+def _extract_pages(reader: "PyPDF2.PdfReader", page_numbers: Iterable[int]) -> Tuple[List[str], bool]:
+    """
+    Extract text for the given pages of an open reader.
+
+    Args:
+        reader: PyPDF2 reader for the document
+        page_numbers: Zero-based page indices, in output order
+
+    Returns:
+        Tuple (parts, any_extracted). Parts are text pieces ready to be joined: each
+        non-empty page followed by a blank line, or an inline error marker for pages
+        that could not be read. any_extracted is True if at least one page had text.
+    """
+    parts = []
+    any_extracted = False
+    for page_num in page_numbers:
+        try:
+            page = reader.pages[page_num]
+            page_text = (page.extract_text() or "").strip()
+            if page_text: # Only append if text was actually extracted
+                parts.append(page_text)
+                parts.append("\n\n") # Double newline between pages
+                any_extracted = True
+        except Exception as page_e:
+            # Log error for specific page and continue if possible
+            parts.append(f"\n[Error extracting page {page_num + 1}: {str(page_e)}]\n")
+    return parts, any_extracted
+
+def _extract_page_range(pdf_path: str, start: int, stop: int) -> Tuple[List[str], bool]:
+    """
+    Worker entry point: extract pages [start, stop) with a private reader,
+    since PyPDF2 readers cannot be shared between workers.
+    """
+    with open(pdf_path, 'rb') as file:
+        return _extract_pages(PyPDF2.PdfReader(file), range(start, stop))
+
+def _get_extract_pool() -> ProcessPoolExecutor:
+    """Return the shared page-extraction pool, creating it on first use."""
+    global _extract_pool
+    with _extract_pool_lock:
+        if _extract_pool is None:
+            _extract_pool = ProcessPoolExecutor(
+                max_workers=MAX_EXTRACT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _extract_pool
+
+def _discard_extract_pool(pool: ProcessPoolExecutor) -> None:
+    """Drop a broken pool so the next extraction starts a fresh one."""
+    global _extract_pool
+    with _extract_pool_lock:
+        if _extract_pool is pool:
+            _extract_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
 class PDFHandler:
     """Handles PDF uploads and text extraction."""
     
+    __slots__ = ("upload_folder", "cache_dir", "_enc_cache")
+    
     def __init__(self, upload_folder: str = "uploads/pdfs"):
         """
         Initialize the PDF handler.
@@ -22,18 +112,22 @@ class PDFHandler:
             upload_folder: Directory to store uploaded PDFs
         """
         self.upload_folder = upload_folder
-        os.makedirs(upload_folder, exist_ok=True)
+        # Extracted text keyed by PDF content digest, so re-uploads skip extraction
+        self.cache_dir = os.path.join(upload_folder, ".textcache")
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # PDF content digest -> whether a password is required to read it
+        self._enc_cache: Dict[str, bool] = {}
     
-    def save_pdf(self, pdf_file, filename: str) -> str:
+    def save_pdf(self, pdf_file, filename: str) -> Tuple[str, str]:
         """
-        Save an uploaded PDF file to disk.
+        Save an uploaded PDF file to disk, hashing it in the same pass.
         
         Args:
             pdf_file: The uploaded PDF file object
             filename: Name to save the file as
             
         Returns:
-            Path to the saved PDF file
+            Tuple (path to the saved PDF file, content digest of the PDF)
         """
         file_path = os.path.join(self.upload_folder, filename)
         
@@ -41,10 +135,15 @@ class PDFHandler:
         # Ensure the file cursor is at the beginning if it has been read before
         if hasattr(pdf_file, 'seek'):
             pdf_file.seek(0)
+        # Stream in chunks so large PDFs are never held in memory whole, and hash each
+        # chunk as it is written so the bytes are only read once
+        digest = hashlib.new(DIGEST_ALGORITHM)
         with open(file_path, 'wb') as f:
-            f.write(pdf_file.read())
+            while chunk := pdf_file.read(COPY_BUFFER_SIZE):
+                f.write(chunk)
+                digest.update(chunk)
             
-        return file_path
+        return file_path, digest.hexdigest()
     
     def extract_text_with_pypdf2(self, pdf_path: str) -> Tuple[Optional[str], Optional[str]]:
         """
@@ -57,7 +156,7 @@ class PDFHandler:
             Tuple (extracted_text, error_message). Text is None if extraction fails.
         """
         try:
-            text = ""
+            # Pages are collected in a list and joined once; repeated += is quadratic on long documents
             num_pages = 0
             with open(pdf_path, 'rb') as file:
                 reader = PyPDF2.PdfReader(file)
@@ -67,29 +166,90 @@ class PDFHandler:
                     return None, "This PDF is encrypted and requires a password for text extraction."
                 
                 num_pages = len(reader.pages)
-                # Add diagnostic info about page count
-                text += f"(PyPDF2 attempting to process {num_pages} pages)\n\n" 
                 
-                # Extract text from each page
-                for page_num in range(num_pages):
-                    try:
-                        page = reader.pages[page_num]
-                        page_text = page.extract_text()
-                        if page_text: # Only append if text was actually extracted
-                            text += page_text.strip() + "\n\n" # Use strip() and double newline
-                    except Exception as page_e:
-                        # Log error for specific page and continue if possible
-                        text += f"\n[Error extracting page {page_num + 1}: {str(page_e)}]\n"
-                        continue # Try next page
+                # Extract text from each page; large documents are split across worker
+                # processes (PyPDF2 is pure Python, so threads would serialize on the GIL)
+                if num_pages >= PARALLEL_PAGE_THRESHOLD and MAX_EXTRACT_WORKERS > 1:
+                    parts, any_extracted = self._extract_pages_parallel(pdf_path, reader, num_pages)
+                else:
+                    parts, any_extracted = _extract_pages(reader, range(num_pages))
             
-            # Check if any meaningful text was extracted besides the diagnostic info
-            if len(text.replace(f"(PyPDF2 attempting to process {num_pages} pages)\n\n", "").strip()) == 0:
+            # Per-page error markers alone don't count as extracted text
+            if not any_extracted:
                  return None, f"PyPDF2 processed {num_pages} pages but extracted no text."
 
+            text = "".join(parts)
             return text.strip(), None # Return stripped text and no error
         except Exception as e:
             return None, f"Error extracting text with PyPDF2: {str(e)}"
     
+    def _extract_pages_parallel(self, pdf_path: str, reader: "PyPDF2.PdfReader", num_pages: int) -> Tuple[List[str], bool]:
+        """
+        Extract all pages using the shared process pool, one contiguous page range per worker.
+        Falls back to sequential extraction with the already-open reader if the pool fails.
+        
+        Args:
+            pdf_path: Path to the PDF file
+            reader: Open reader, used only for the sequential fallback
+            num_pages: Number of pages in the document
+            
+        Returns:
+            Tuple (text pieces for every page in page order, whether any page had text)
+        """
+        workers = min(MAX_EXTRACT_WORKERS, num_pages)
+        chunk = -(-num_pages // workers)
+        starts = list(range(0, num_pages, chunk))
+        stops = [min(start + chunk, num_pages) for start in starts]
+        pool = None
+        try:
+            parts = []
+            any_extracted = False
+            pool = _get_extract_pool()
+            # map() yields results in submission order, so pages stay in order
+            for chunk_parts, chunk_extracted in pool.map(_extract_page_range, [pdf_path] * len(starts), starts, stops):
+                parts.extend(chunk_parts)
+                any_extracted = any_extracted or chunk_extracted
+            return parts, any_extracted
+        except (BrokenProcessPool, OSError) as e:
+            if pool is not None:
+                _discard_extract_pool(pool)
+            logger.warning("Parallel PDF extraction unavailable (%s); extracting pages sequentially.", e)
+            return _extract_pages(reader, range(num_pages))
+    
+    def extract_text_with_pdfium(self, pdf_path: str) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Extract text from a PDF using pypdfium2 (bindings to Google's PDFium).
+        
+        Args:
+            pdf_path: Path to the PDF file
+            
+        Returns:
+            Tuple (extracted_text, error_message). Text is None if extraction fails.
+        """
+        if pdfium is None:
+            return None, "pypdfium2 is not installed."
+        try:
+            with _PDFIUM_LOCK:
+                pdf = pdfium.PdfDocument(pdf_path)
+                try:
+                    parts = []
+                    for page in pdf:
+                        textpage = page.get_textpage()
+                        page_text = textpage.get_text_range().strip()
+                        textpage.close()
+                        page.close()
+                        if page_text:
+                            parts.append(page_text)
+                finally:
+                    pdf.close()
+            
+            if not parts:
+                return None, "pdfium opened the PDF but extracted no text."
+            
+            return "\n\n".join(parts), None
+        except Exception as e:
+            return None, f"Error extracting text with pdfium: {str(e)}"
+    
     def extract_text_with_pdftotext(self, pdf_path: str) -> Tuple[Optional[str], Optional[str]]:
         """
         Extract text from a PDF using poppler-utils' pdftotext.
@@ -101,22 +261,19 @@ class PDFHandler:
         Returns:
             Tuple (extracted_text, error_message). Text is None if extraction fails.
         """
-        temp_path = None
         try:
-            # Create a temporary file to store the extracted text
-            # Use delete=False and manual cleanup in finally block
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False) as temp_file:
-                temp_path = temp_file.name
-            
             # Run pdftotext command, ensuring no page limits are set by default
             # Using -layout to preserve structure which might help segmentation later
-            command = ['pdftotext', '-layout', pdf_path, temp_path]
+            # Output file "-" writes the text to stdout, avoiding a temp file round-trip
+            command = ['pdftotext', '-layout', '-enc', 'UTF-8', pdf_path, '-']
             result = subprocess.run(
                 command,
                 capture_output=True,
                 text=True,
+                encoding='utf-8',
+                errors='replace',
                 check=False, # Don't raise exception on non-zero exit
-                timeout=60 # Add a timeout to prevent hangs
+                timeout=PDFTOTEXT_TIMEOUT # Add a timeout to prevent hangs
             )
             
             if result.returncode != 0:
@@ -128,33 +285,86 @@ class PDFHandler:
                      return None, "pdftotext failed: PDF is encrypted."
                 return None, f"pdftotext failed (code {result.returncode}): {result.stderr}"
             
-            # Read the extracted text
-            with open(temp_path, 'r', encoding='utf-8') as f:
-                text = f.read()
+            text = result.stdout
             
             if not text or text.isspace():
                 return None, "pdftotext ran successfully but extracted no text."
 
             return text.strip(), None # Return stripped text and no error
         except subprocess.TimeoutExpired:
-             return None, "pdftotext command timed out after 60 seconds."
+             return None, f"pdftotext command timed out after {PDFTOTEXT_TIMEOUT} seconds."
         except FileNotFoundError:
              return None, "pdftotext command not found. Please ensure poppler-utils is installed."
         except Exception as e:
             return None, f"Error during pdftotext execution: {str(e)}"
-        finally:
-            # Ensure temporary file is deleted
-            if temp_path and os.path.exists(temp_path):
-                try:
-                    os.unlink(temp_path)
-                except OSError:
-                    pass # Ignore deletion errors
 
+    def _is_encrypted(self, pdf_path: str, digest: str) -> bool:
+        """
+        Check whether a PDF needs a password before any text can be extracted.
+        Only the trailer and encryption dictionary are parsed, not the pages.
+        PDFs that are encrypted with an empty user password (permissions only) open
+        normally and are not reported as encrypted.
+        
+        Args:
+            pdf_path: Path to the PDF file
+            digest: Content digest of the PDF, used as the cache key
+            
+        Returns:
+            True if the PDF cannot be read without a password
+        """
+        encrypted = self._enc_cache.get(digest)
+        if encrypted is None:
+            try:
+                with open(pdf_path, 'rb') as file:
+                    reader = PyPDF2.PdfReader(file)
+                    encrypted = bool(reader.is_encrypted and not reader.decrypt(""))
+            except Exception:
+                encrypted = False # Unreadable for other reasons; let the extractors report it
+            self._enc_cache[digest] = encrypted
+        return encrypted
+    
+    def _read_cached_text(self, digest: str) -> Optional[str]:
+        """
+        Look up previously extracted text for a PDF.
+        
+        Args:
+            digest: Content digest of the PDF
+            
+        Returns:
+            The cached text, or None on a cache miss
+        """
+        try:
+            with open(os.path.join(self.cache_dir, f"{digest}.txt"), 'r', encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            return None
+    
+    def _write_cached_text(self, digest: str, text: str) -> None:
+        """
+        Store extracted text for a PDF. The file is written under a temporary name
+        and renamed into place, so concurrent readers never see a partial entry.
+        
+        Args:
+            digest: Content digest of the PDF
+            text: Successfully extracted text
+        """
+        temp_path = None
+        try:
+            with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=self.cache_dir, suffix='.tmp', delete=False) as f:
+                temp_path = f.name
+                f.write(text)
+            os.replace(temp_path, os.path.join(self.cache_dir, f"{digest}.txt"))
+        except OSError as e:
+            logger.warning("Could not cache extracted PDF text: %s", e)
+            # Caching is best effort: a failed cleanup must not fail the upload
+            if temp_path:
+                with suppress(OSError):
+                    os.unlink(temp_path)
     
     def process_pdf(self, pdf_file, filename: str) -> Tuple[str, Optional[str]]:
         """
         Process an uploaded PDF: save it and extract text from the entire document.
-        Prioritizes pdftotext, falls back to PyPDF2.
+        Tries pdfium first (when installed), then pdftotext, and falls back to PyPDF2.
         
         Args:
             pdf_file: The uploaded PDF file object
@@ -163,25 +373,40 @@ class PDFHandler:
         Returns:
             Tuple containing (file_path, extracted_text or error_message)
         """
-        file_path = self.save_pdf(pdf_file, filename)
+        file_path, digest = self.save_pdf(pdf_file, filename)
+        cached_text = self._read_cached_text(digest)
+        if cached_text is not None:
+            return file_path, cached_text
+
+        # Every extractor fails on password-protected PDFs, so don't spawn pdftotext for them
+        if self._is_encrypted(file_path, digest):
+            return file_path, "This PDF is encrypted and requires a password for text extraction."
+
         final_text = None
-        error_message = "No text extraction method succeeded."
+        error_message = ""
 
-        # 1. Try pdftotext
-        text_pdt, err_pdt = self.extract_text_with_pdftotext(file_path)
-        if text_pdt:
-            final_text = text_pdt
-            error_message = None # Success
-        else:
-            # Record pdftotext error if it occurred
-            error_message = f"pdftotext failed: {err_pdt}. " if err_pdt else "pdftotext extracted no text. "
+        # 1. Try pdfium, if installed
+        if pdfium is not None:
+            text_pdfium, err_pdfium = self.extract_text_with_pdfium(file_path)
+            if text_pdfium:
+                final_text = text_pdfium
+            else:
+                error_message += f"pdfium failed: {err_pdfium}. " if err_pdfium else "pdfium extracted no text. "
+
+        # 2. Try pdftotext
+        if final_text is None:
+            text_pdt, err_pdt = self.extract_text_with_pdftotext(file_path)
+            if text_pdt:
+                final_text = text_pdt
+            else:
+                # Record pdftotext error if it occurred
+                error_message += f"pdftotext failed: {err_pdt}. " if err_pdt else "pdftotext extracted no text. "
 
-        # 2. If pdftotext failed or returned no text, try PyPDF2
+        # 3. If the faster extractors failed or returned no text, try PyPDF2
         if final_text is None:
             text_pypdf, err_pypdf = self.extract_text_with_pypdf2(file_path)
             if text_pypdf:
                 final_text = text_pypdf
-                error_message = None # Success with fallback
             elif err_pypdf:
                 # Append PyPDF2 error to the previous message
                 error_message += f"PyPDF2 also failed: {err_pypdf}"
@@ -192,4 +417,5 @@ class PDFHandler:
         if final_text is None:
              return file_path, error_message
         else:
+             self._write_cached_text(digest, final_text)
              return file_path, final_text
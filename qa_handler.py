@@ -3,14 +3,46 @@
 """
 Handles the logic for answering questions based on provided context.
 """
+from collections import OrderedDict
+from typing import Tuple
+
+# Number of recent contexts whose case-folded copy is kept between questions
+INDEX_CACHE_SIZE = 4
 
 class QAHandler:
     """Processes questions and generates answers based on context."""
 
+    __slots__ = ("_index_cache",)
+
     def __init__(self):
         """Initialize the Q&A handler."""
         # In a real scenario, this might load a model or configure an API client.
-        pass
+        # Context text -> (folded context, whether casefold was used). A chat session asks
+        # many questions about the same material, so it is folded once, not per question.
+        self._index_cache: "OrderedDict[str, Tuple[str, bool]]" = OrderedDict()
+
+    def _index(self, context_text: str) -> Tuple[str, bool]:
+        """
+        Return the case-folded context, reusing it across questions about the same text.
+
+        Args:
+            context_text: The context material.
+
+        Returns:
+            Tuple (folded_context, used_casefold). If casefold would change the text length
+            (e.g. "ß" -> "ss"), lower() is used instead so offsets still match context_text.
+        """
+        entry = self._index_cache.get(context_text)
+        if entry is not None:
+            self._index_cache.move_to_end(context_text)
+            return entry
+
+        folded = context_text.casefold()
+        entry = (folded, True) if len(folded) == len(context_text) else (context_text.lower(), False)
+        self._index_cache[context_text] = entry
+        if len(self._index_cache) > INDEX_CACHE_SIZE:
+            self._index_cache.popitem(last=False)
+        return entry
 
     def get_answer(self, question: str, context_text: str, chat_history: list = None) -> str:
         """
@@ -36,42 +68,40 @@ class QAHandler:
 
         context_preview = context_text[:500] + "..." if len(context_text) > 500 else context_text
         
-        answer = f"Okay, you asked: 
-ások{question}"
-        answer += f"\n\nConsidering the provided material (starting with: 
-ások{context_preview}"), "
+        answer = f"Okay, you asked: \"{question}\""
+        answer += f"\n\nConsidering the provided material (starting with: \"{context_preview}\"), "
         
+        # Fold case once; every lookup below reuses these instead of re-lowering the context
+        context_lower, used_casefold = self._index(context_text)
+        question_lower = question.casefold() if used_casefold else question.lower()
+
         # Simple keyword-based responses for simulation
-        question_lower = question.lower()
         if "example" in question_lower or "instance" in question_lower:
             answer += "I can try to give an example. For instance, if the text mentions 'ratios are comparisons', an example would be comparing 3 apples to 4 oranges, written as 3:4."
         elif "explain more" in question_lower or "clarify" in question_lower or "detail" in question_lower:
             # Try to find a relevant snippet from the context (very basic)
             first_few_words = " ".join(question_lower.split()[-3:]) # last 3 words of question
-            if first_few_words in context_text.lower():
-                start_index = context_text.lower().find(first_few_words)
+            start_index = context_lower.find(first_few_words)
+            if start_index != -1:
                 snippet = context_text[max(0, start_index-50) : min(len(context_text), start_index + 200)]
-                answer += f"let me elaborate on that. The text around that point says: 
-ások...{snippet}...". I hope this additional detail helps!"
+                answer += f"let me elaborate on that. The text around that point says: \"...{snippet}...\". I hope this additional detail helps!"
             else:
                 answer += "I can elaborate further. The core idea is [simulated deeper explanation of a general concept from the context]."
         elif "what is" in question_lower or "define" in question_lower:
             # Simulate finding a definition (very basic)
             term_to_define = question_lower.replace("what is", "").replace("define", "").strip().rstrip("?")
-            if term_to_define and term_to_define in context_text.lower():
-                 start_index = context_text.lower().find(term_to_define)
-                 # Find the sentence containing the term
-                 sentence_start = context_text.rfind(". ", 0, start_index) + 2
-                 if sentence_start == 1: sentence_start = 0 # if no period before
-                 sentence_end = context_text.find(".", start_index)
-                 if sentence_end == -1: sentence_end = len(context_text)
-                 definition_snippet = context_text[sentence_start : sentence_end+1]
-                 answer += f"regarding 
-ások{term_to_define}", the text seems to suggest: 
-ások{definition_snippet}"."
+            start_index = context_lower.find(term_to_define) if term_to_define else -1
+            if start_index != -1:
+                 # Find the sentence containing the term: it starts after the last ". " before
+                 # the term and runs through the first "." after it (or the end of the text)
+                 before, boundary, _ = context_text[:start_index].rpartition(". ")
+                 sentence_start = len(before) + len(boundary)
+                 head, period, _ = context_text[start_index:].partition(".")
+                 sentence_end = start_index + len(head) + len(period)
+                 definition_snippet = context_text[sentence_start : sentence_end]
+                 answer += f"regarding \"{term_to_define}\", the text seems to suggest: \"{definition_snippet}\"."
             else:
-                answer += f"I'll try to define 
-ások{term_to_define}" based on the material. It appears to be [simulated definition of the term]."
+                answer += f"I'll try to define \"{term_to_define}\" based on the material. It appears to be [simulated definition of the term]."
         else:
             answer += "that's an interesting question. Based on the material, I would say [simulated general answer related to the context]. Remember, this is a simplified response."
         
@@ -305,10 +305,6 @@ def render_lessons_page():
     # Render explanation component
     st.session_state.explanation_component.render_explanation_section()
     
-    # Render TTS component if there's an explanation
-    if 'current_explanation' in st.session_state and st.session_state.current_explanation:
-        st.session_state.tts_component.render_audio_player()
-    
     # Show explanation history
     st.session_state.explanation_component.render_explanation_history()
 
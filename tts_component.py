@@ -4,13 +4,123 @@
 Streamlit component for text-to-speech functionality in the AI Tutor application.
 Provides UI elements for audio playback of explanations and text segments.
 """
+import hashlib
 import os
+import threading
 import streamlit as st
-from typing import Dict, Any, Optional
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Dict, Any, Callable, Deque, Iterable, List, Optional, Tuple
 
 # Use relative import within the package
 from text_to_speech import TextToSpeech
 
+# Background threads generating speech, shared by all sessions. Play clicks have their own
+# lane, so they never wait behind another user's "Read all" batch.
+PLAY_WORKERS = 2
+_play_executor = ThreadPoolExecutor(max_workers=PLAY_WORKERS, thread_name_prefix="tts-play")
+# "Read all" jobs are queued per session and served round-robin across sessions, each
+# session's own jobs in reading order
+BATCH_WORKERS = 1
+_batch_executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix="tts-batch")
+# Session key -> that session's queued (job, function, args), sessions in serving order
+_batch_queues: "OrderedDict[int, Deque[Tuple[Future, Callable[..., Dict[str, Any]], tuple]]]" = OrderedDict()
+_batch_queues_lock = threading.Lock()
+
+# Seconds a run waits for pending audio to finish; if none does, the page updates on the next interaction
+AUDIO_WAIT_TIMEOUT = 30
+
+# Number of distinct (language, text) audio results kept for reuse across segments, files and sessions
+AUDIO_CACHE_SIZE = 256
+
+# Content key -> generated audio path, least recently used first. Shared by every session,
+# so identical paragraphs (headers, footers, re-uploaded material) are only spoken once.
+_audio_cache: "OrderedDict[str, str]" = OrderedDict()
+# Background "Read all" workers and the Streamlit script thread both touch the cache
+_audio_cache_lock = threading.Lock()
+
+
+def _audio_cache_key(text: str, lang: str) -> str:
+    """Content key for a piece of speech: identical text in the same language shares one audio file."""
+    return hashlib.sha256(f"{lang}:{text}".encode("utf-8")).hexdigest()
+
+
+def _cached_audio_path(key: str) -> Optional[str]:
+    """Return the cached audio path for a key if its file still exists, dropping stale entries."""
+    with _audio_cache_lock:
+        audio_path = _audio_cache.get(key)
+        if audio_path is None:
+            return None
+        if not os.path.exists(audio_path):
+            del _audio_cache[key]
+            return None
+        _audio_cache.move_to_end(key)
+        return audio_path
+
+
+def _store_audio_path(key: str, audio_path: str) -> None:
+    """Remember generated audio, evicting (and deleting) the least recently used files past the limit."""
+    with _audio_cache_lock:
+        _audio_cache[key] = audio_path
+        _audio_cache.move_to_end(key)
+        while len(_audio_cache) > AUDIO_CACHE_SIZE:
+            _, evicted_path = _audio_cache.popitem(last=False)
+            # The backend may hand out the same path for different texts; keep it while still referenced
+            if evicted_path in _audio_cache.values():
+                continue
+            try:
+                os.remove(evicted_path)
+            except OSError:
+                pass
+
+
+def _submit_batch_job(session_key: int, fn: Callable[..., Dict[str, Any]], *args) -> Future:
+    """
+    Queue a "Read all" job for a session.
+
+    Args:
+        session_key: Identifies the session whose queue the job joins.
+        fn: Function generating the audio.
+        *args: Arguments for fn.
+
+    Returns:
+        Future for the job's result; cancelling it before it starts skips the job.
+    """
+    job = Future()
+    with _batch_queues_lock:
+        _batch_queues.setdefault(session_key, deque()).append((job, fn, args))
+    _batch_executor.submit(_run_next_batch_job)
+    return job
+
+
+def _run_next_batch_job() -> None:
+    """Run the next queued job of the session whose turn it is, skipping cancelled jobs."""
+    while True:
+        with _batch_queues_lock:
+            if not _batch_queues:
+                return
+            session_key, queue = next(iter(_batch_queues.items()))
+            job, fn, args = queue.popleft()
+            # The session goes to the back of the line, or leaves it once its queue is empty
+            if queue:
+                _batch_queues.move_to_end(session_key)
+            else:
+                del _batch_queues[session_key]
+        if not job.set_running_or_notify_cancel():
+            continue
+        try:
+            job.set_result(fn(*args))
+        except Exception as e:
+            job.set_exception(e)
+        return
+
+
+def _is_shared_audio(audio_path: str) -> bool:
+    """Whether a file belongs to the shared audio cache (and may be playing in other segments)."""
+    with _audio_cache_lock:
+        return audio_path in _audio_cache.values()
+
+
 class TTSComponent:
     """
     Streamlit component for handling text-to-speech in the AI Tutor application.
@@ -32,11 +142,133 @@ class TTSComponent:
             st.session_state.current_audio_path = None # Path to the generated audio file
         if 'audio_generation_error' not in st.session_state:
             st.session_state.audio_generation_error = None
+        if 'segment_audio_cache' not in st.session_state:
+            st.session_state.segment_audio_cache = {} # segment ID -> audio path generated by "Read all"
+
+        # Background generation jobs: "Read all" segments by ID, and the (segment_id, job)
+        # started by a segment's Play button. Workers never touch st.session_state.
+        self._segment_jobs: Dict[str, Future] = {}
+        self._play_job: Optional[Tuple[str, Future]] = None
+
+    def _generate_speech(self, text: str, lang: str = "en") -> Dict[str, Any]:
+        """
+        Generate speech for a text, reusing the audio of identical text generated before.
+
+        Args:
+            text: Text to convert to speech.
+            lang: Language code passed to the TTS handler.
+
+        Returns:
+            Result dictionary in the TTS handler's format (success, file_path, error).
+        """
+        key = _audio_cache_key(text, lang)
+        audio_path = _cached_audio_path(key)
+        if audio_path is not None:
+            return {"success": True, "file_path": audio_path, "error": None}
+
+        result = self.tts_handler.generate_speech_for_explanation(text, lang=lang)
+        if result["success"]:
+            _store_audio_path(key, result["file_path"])
+        return result
+
+    def enqueue_segments(self, segments: List[Tuple[str, str]]) -> None:
+        """
+        Queue audio generation for several segments at once ("Read all").
+        The first segment to generate goes to the Play lane so it starts right away; the
+        rest join this session's batch queue. Nothing is waited for here: the audio is
+        picked up by render_audio_player_for_segment on later reruns.
+
+        Args:
+            segments: (segment_id, segment_text) pairs in reading order.
+        """
+        first = True
+        for segment_id, segment_text in segments:
+            if segment_id in self._segment_jobs:
+                continue
+            audio_path = st.session_state.segment_audio_cache.get(segment_id)
+            if audio_path:
+                if os.path.exists(audio_path):
+                    continue
+                # The shared cache evicted (deleted) this audio since; generate it again
+                del st.session_state.segment_audio_cache[segment_id]
+            if first:
+                job = _play_executor.submit(self._generate_speech, segment_text)
+                first = False
+            else:
+                job = _submit_batch_job(id(self), self._generate_speech, segment_text)
+            self._segment_jobs[segment_id] = job
+
+    def _collect_segment_audio(self, segment_text: str, segment_id: str) -> Tuple[Optional[str], bool]:
+        """
+        Look up ready audio for a segment: batch-generated audio, a finished background job,
+        or audio already generated for identical text elsewhere.
+
+        Args:
+            segment_text: The text of the segment.
+            segment_id: A unique identifier for the text segment.
+
+        Returns:
+            Tuple (audio_path or None, still_pending).
+        """
+        audio_path = st.session_state.segment_audio_cache.get(segment_id)
+        if audio_path:
+            if os.path.exists(audio_path):
+                return audio_path, False
+            # Evicted from the shared cache (and deleted) since it was generated
+            del st.session_state.segment_audio_cache[segment_id]
+
+        job = self._segment_jobs.get(segment_id)
+        if job is None:
+            audio_path = _cached_audio_path(_audio_cache_key(segment_text, "en"))
+            if audio_path:
+                st.session_state.segment_audio_cache[segment_id] = audio_path
+            return audio_path, False
+        if not job.done():
+            return None, True
+
+        del self._segment_jobs[segment_id]
+        try:
+            result = job.result()
+        except Exception as e:
+            st.warning(f"Failed to generate audio: {e}")
+            return None, False
+        if not result["success"]:
+            st.warning(f"Failed to generate audio: {result['error']}")
+            return None, False
+        st.session_state.segment_audio_cache[segment_id] = result["file_path"]
+        return result["file_path"], False
+
+    def _collect_play_audio(self, segment_id: str) -> bool:
+        """
+        Harvest the Play job for a segment into current_audio_path / audio_generation_error.
+
+        Args:
+            segment_id: A unique identifier for the text segment.
+
+        Returns:
+            True while the segment's audio is still being generated.
+        """
+        if self._play_job is None or self._play_job[0] != segment_id:
+            return False
+        job = self._play_job[1]
+        if not job.done():
+            return True
+
+        self._play_job = None
+        try:
+            result = job.result()
+        except Exception as e:
+            result = {"success": False, "error": str(e)}
+        if result["success"]:
+            st.session_state.current_audio_path = result["file_path"]
+        else:
+            st.session_state.audio_generation_error = f"Failed to generate audio: {result['error']}"
+        return False
 
     def render_audio_player_for_segment(self, segment_text: str, segment_id: str, source: Optional[str] = None) -> None:
         """
         Render the audio player specifically for a text segment.
-        Generates audio if the segment ID matches the one requested for playback.
+        Starts background generation if the segment ID matches the one requested for playback.
 
         Args:
             segment_text: The text of the segment to potentially play.
@@ -51,18 +283,13 @@ class TTSComponent:
             st.session_state.audio_generation_error = None
             st.session_state.current_audio_segment_id = segment_id # Mark this segment as the target
 
-            with st.spinner(f"Generating audio for segment..."):
-                result = self.tts_handler.generate_speech_for_explanation(segment_text) # Use existing method
-                
-                if result["success"]:
-                    st.session_state.current_audio_path = result["file_path"]
-                    st.success("Audio generated!", icon="🔊")
-                else:
-                    st.session_state.audio_generation_error = f"Failed to generate audio: {result['error']}"
-                    st.error(st.session_state.audio_generation_error)
-            
-            # Rerun to display the player immediately after generation
-            st.experimental_rerun()
+            # Generate in the background so the rest of the page renders (and stays usable)
+            # while the TTS backend works; rerun_when_audio_ready shows the player once it's done
+            self._play_job = (segment_id, _play_executor.submit(self._generate_speech, segment_text))
+
+        if self._collect_play_audio(segment_id):
+            st.caption("🎙️ Generating audio...")
+            return
 
         # Display the audio player if the audio for *this* segment is ready
         if st.session_state.current_audio_segment_id == segment_id and st.session_state.current_audio_path:
@@ -75,6 +302,7 @@ class TTSComponent:
                     # Add a button to clear this specific audio to save space/avoid confusion
                     if st.button("Clear Audio", key=f"clear_audio_{segment_id}"):
                         self._clear_current_audio()
+                        self.cancel_queued_segments()
                         st.experimental_rerun()
 
                 except Exception as e:
@@ -96,6 +324,54 @@ class TTSComponent:
                  st.session_state.current_audio_segment_id = None
                  st.experimental_rerun()
 
+        # Otherwise show audio queued by "Read all", if it is ready
+        else:
+            audio_path, pending = self._collect_segment_audio(segment_text, segment_id)
+            audio_bytes = None
+            if audio_path:
+                try:
+                    with open(audio_path, "rb") as audio_file:
+                        audio_bytes = audio_file.read()
+                except OSError:
+                    # Evicted from the shared cache (and deleted) since it was looked up; not ready yet
+                    st.session_state.segment_audio_cache.pop(segment_id, None)
+            if audio_bytes is not None:
+                st.audio(audio_bytes, format="audio/mp3")
+            elif pending:
+                st.caption("Queued for reading aloud...")
+
+
+    def cancel_queued_segments(self, segment_ids: Optional[Iterable[str]] = None) -> None:
+        """
+        Cancel "Read all" jobs that have not started yet and forget their audio.
+
+        Args:
+            segment_ids: Segments to cancel (e.g. those of a removed file); all queued segments if None.
+        """
+        for segment_id in list(self._segment_jobs) if segment_ids is None else segment_ids:
+            job = self._segment_jobs.pop(segment_id, None)
+            if job is not None:
+                job.cancel() # No-op if already running; its result still lands in the shared cache
+            st.session_state.segment_audio_cache.pop(segment_id, None)
+
+    def rerun_when_audio_ready(self, segment_ids: Iterable[str]) -> None:
+        """
+        Call once at the end of a page that shows segment players: if audio for one of the
+        shown segments is still being generated, wait for a job to finish and rerun, so its
+        player appears without the user having to interact.
+
+        Args:
+            segment_ids: Segments whose players were rendered in this run (open readers only).
+        """
+        shown = set(segment_ids)
+        pending = [job for segment_id, job in self._segment_jobs.items() if segment_id in shown and not job.done()]
+        if self._play_job is not None and self._play_job[0] in shown and not self._play_job[1].done():
+            pending.append(self._play_job[1])
+        if not pending:
+            return
+        done, _ = wait(pending, timeout=AUDIO_WAIT_TIMEOUT, return_when=FIRST_COMPLETED)
+        if done:
+            st.experimental_rerun()
 
     def trigger_audio_generation_for_segment(self, segment_id: str):
         """
@@ -108,9 +384,9 @@ class TTSComponent:
         # No rerun here, the component calling this should handle the rerun
 
     def _clear_current_audio(self):
-        """Clears the current audio state and deletes the associated file."""
+        """Clears the current audio state and deletes the associated file (unless it is shared)."""
         audio_path = st.session_state.get('current_audio_path')
-        if audio_path and os.path.exists(audio_path):
+        if audio_path and not _is_shared_audio(audio_path) and os.path.exists(audio_path):
             try:
                 os.remove(audio_path)
             except Exception as e:
@@ -119,6 +395,10 @@ class TTSComponent:
         st.session_state.current_audio_segment_id = None
         st.session_state.current_audio_path = None
         st.session_state.audio_generation_error = None
+        # A pending Play job's result is no longer wanted; cancel it if it hasn't started
+        if self._play_job is not None:
+            self._play_job[1].cancel()
+            self._play_job = None
         # Clear the trigger as well if it's still set
         if 'generate_audio_for_segment' in st.session_state:
             st.session_state.generate_audio_for_segment = None
@@ -153,7 +433,7 @@ class TTSComponent:
             # Clear previous state
             self._clear_explanation_audio()
             with st.spinner("Converting explanation to speech..."):
-                result = self.tts_handler.generate_speech_for_explanation(text)
+                result = self._generate_speech(text)
                 
                 if result["success"]:
                     st.session_state[explanation_audio_key] = result["file_path"]
@@ -190,11 +470,11 @@ class TTSComponent:
                  st.experimental_rerun()
 
     def _clear_explanation_audio(self):
-        """Clears the explanation audio state and deletes the file."""
+        """Clears the explanation audio state and deletes the file (unless it is shared)."""
         explanation_audio_key = 'current_explanation_audio'
         explanation_error_key = 'explanation_audio_error'
         audio_path = st.session_state.get(explanation_audio_key)
-        if audio_path and os.path.exists(audio_path):
+        if audio_path and not _is_shared_audio(audio_path) and os.path.exists(audio_path):
             try:
                 os.remove(audio_path)
             except Exception as e:
@@ -5,15 +5,30 @@ Streamlit component for file upload functionality in the AI Tutor application.
 Provides UI elements for uploading, displaying files, and an interactive reader
 with improved text segmentation for audio playback.
 """
+import html
 import os
 import streamlit as st
-from typing import Dict, Any, List
+from typing import List
 import re
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import suppress
+from itertools import chain
 
 # Use relative import within the package
-from upload_manager import UploadManager
+from upload_manager import UploadedFile, UploadManager
+from upload_utils import release_shared_file
 # Assuming tts_component is initialized in streamlit_app.py and available in session_state
 
+# Number of uploads processed concurrently when several files are submitted at once
+MAX_UPLOAD_WORKERS = 4
+
+# Style for the paragraph currently being read aloud, sent once per render instead of inline per paragraph
+_HIGHLIGHT_STYLE = "<style>.tts-highlight{background:#ffff99;padding:5px;border-radius:3px;}</style>"
+
+# Markers of a failed extraction in the extracted_text field ("Error" is case-sensitive)
+_EXTRACTION_ERR_RE = re.compile(r'Error|(?i:failed|not found)')
+
 class UploadComponent:
     """
     Streamlit component for handling file uploads and interactive reading.
@@ -29,8 +44,9 @@ class UploadComponent:
         self.upload_manager = upload_manager
         
         # Create session state variables if they don't exist
+        # saved_filename -> UploadedFile, newest first
         if 'uploaded_files' not in st.session_state:
-            st.session_state.uploaded_files = []
+            st.session_state.uploaded_files = OrderedDict()
         # Ensure TTS component state exists (might be redundant if initialized elsewhere)
         if 'tts_component' not in st.session_state:
              # This is a fallback, ideally it's initialized in the main app
@@ -49,41 +65,89 @@ class UploadComponent:
         Returns:
             A list of text segments.
         """
-        # Split by double newlines or more, preserving structure better
-        raw_segments = re.split(r'(\n\s*){2,}', text)
-        
         merged_segments = []
-        current_segment = ""
+        # The segment being merged is kept as its parts plus a running length, so merging
+        # many short paragraphs is one join instead of repeated (quadratic) concatenation
+        current_parts = []
+        current_len = 0
+        paragraph_lines = []
 
-        for seg in raw_segments:
-            if seg is None: continue # Skip separators captured by regex groups
-            
-            cleaned_seg = seg.strip()
-            if not cleaned_seg: # Skip empty lines or whitespace-only lines
+        # Single pass over the lines: a blank (or whitespace-only) line ends a paragraph,
+        # i.e. paragraphs are split on double newlines or more. The trailing "" flushes
+        # the last paragraph. str.split/strip already take CPython's compact-ASCII fast
+        # path for plain-ASCII text; a bytes round-trip or a regex split measured slower.
+        for line in chain(text.split("\n"), ("",)):
+            line = line.strip()
+            if line:
+                paragraph_lines.append(line)
+                continue
+            if not paragraph_lines: # Skip runs of empty lines
                 continue
 
-            # Replace single newlines within a segment with spaces
-            cleaned_seg = re.sub(r'\s*\n\s*', ' ', cleaned_seg)
+            # Single newlines within a paragraph become spaces
+            cleaned_seg = " ".join(paragraph_lines)
+            paragraph_lines.clear()
 
-            # If current_segment is empty, start with the new cleaned segment
-            if not current_segment:
-                current_segment = cleaned_seg
-            # If current_segment is too short, append the new one
-            elif len(current_segment) < min_length:
-                current_segment += " " + cleaned_seg
-            # If current_segment is long enough, finalize it and start new segment
+            # If the current segment is empty, start with the new cleaned segment
+            if not current_parts:
+                current_parts.append(cleaned_seg)
+                current_len = len(cleaned_seg)
+            # If the current segment is too short, append the new one
+            elif current_len < min_length:
+                current_parts.append(cleaned_seg)
+                current_len += 1 + len(cleaned_seg)
+            # If the current segment is long enough, finalize it and start new segment
             else:
-                merged_segments.append(current_segment)
-                current_segment = cleaned_seg
+                merged_segments.append(" ".join(current_parts))
+                current_parts = [cleaned_seg]
+                current_len = len(cleaned_seg)
 
         # Add the last accumulated segment if it exists
-        if current_segment:
-            merged_segments.append(current_segment)
+        if current_parts:
+            merged_segments.append(" ".join(current_parts))
             
         # Final check: if any segment is excessively long, try splitting by sentences? (Future enhancement)
         # For now, return the merged segments
         return merged_segments
 
+    def _prepare_file_info(self, file_info: UploadedFile) -> UploadedFile:
+        """
+        Fill in the derived display fields of an upload. They only depend on the
+        extracted text, so they are computed once per upload instead of on every rerun.
+
+        Args:
+            file_info: File information returned by UploadManager.process_upload
+
+        Returns:
+            The same object, with file_type_upper, is_extraction_error, segments and
+            the widget keys filled in
+        """
+        if file_info.segments is not None:
+            return file_info
+
+        extracted_text = file_info.extracted_text
+        # One scan of the original text, without building lowercased copies
+        is_extraction_error = bool(extracted_text) and _EXTRACTION_ERR_RE.search(extracted_text) is not None
+
+        file_info.file_type_upper = file_info.file_type.upper()
+        file_info.is_extraction_error = is_extraction_error
+        # Segments for the interactive reader (only meaningful for successfully extracted text)
+        file_info.segments = self._segment_text(extracted_text) if extracted_text and not is_extraction_error else []
+
+        # Widget keys are built once per file rather than on every rerun. saved_filename is
+        # unique, so keys stay stable when newer uploads are listed above this one.
+        saved_fn = file_info.saved_filename
+        segment_ids = [f"{saved_fn}_seg_{seg_idx}" for seg_idx in range(len(file_info.segments))]
+        file_info.segment_keys = [(segment_id, f"play_{segment_id}") for segment_id in segment_ids]
+        file_info.widget_keys = {
+            'full_text': f"full_text_{saved_fn}",
+            'reader_open': f"reader_open_{saved_fn}",
+            'read_all': f"read_all_{saved_fn}",
+            'explain': f"explain_{saved_fn}",
+            'remove': f"remove_{saved_fn}",
+        }
+        return file_info
+
     def render_upload_section(self) -> None:
         """
         Render the file upload section in the Streamlit UI.
@@ -103,32 +167,59 @@ class UploadComponent:
         if uploaded_files and st.button("Process Uploads"):
             with st.spinner("Processing files..."):
                 newly_processed_files = []
+                # Names already processed in this session, for O(1) duplicate checks
+                existing_names = {f.original_filename for f in st.session_state.uploaded_files.values()}
+                files_to_process = []
                 for uploaded_file in uploaded_files:
-                    # Skip if file was already processed in this session
-                    if any(f.get('original_filename') == uploaded_file.name for f in st.session_state.uploaded_files):
+                    # Skip if file was already processed in this session (or earlier in this batch)
+                    if uploaded_file.name in existing_names:
                         st.info(f"Skipping already processed file: {uploaded_file.name}")
                         continue
-                    
-                    # Process the file
-                    file_info = self.upload_manager.process_upload(uploaded_file, uploaded_file.name)
+                    existing_names.add(uploaded_file.name)
+                    files_to_process.append(uploaded_file)
+
+                # Image and DOCX extraction is mostly disk writes and subprocess calls (OCR), so
+                # those files are processed concurrently. PDFs stay on this thread, one at a time:
+                # PDF extraction already uses a shared process pool, and PDFium is not thread-safe.
+                # Workers never touch Streamlit; results are reported below in upload order.
+                with ThreadPoolExecutor(max_workers=MAX_UPLOAD_WORKERS) as executor:
+                    jobs = [None if os.path.splitext(uploaded_file.name)[1].lower() == '.pdf'
+                            else executor.submit(self.upload_manager.process_upload, uploaded_file, uploaded_file.name)
+                            for uploaded_file in files_to_process]
+                    results = [self.upload_manager.process_upload(uploaded_file, uploaded_file.name) if job is None else job
+                               for uploaded_file, job in zip(files_to_process, jobs)]
+
+                for uploaded_file, result in zip(files_to_process, results):
+                    file_info = result.result() if isinstance(result, Future) else result
+
+                    # Identical images/DOCX files share one saved file name; list that content once
+                    if file_info:
+                        duplicate_of = st.session_state.uploaded_files.get(file_info.saved_filename) or next(
+                            (f for f in newly_processed_files if f.saved_filename == file_info.saved_filename), None)
+                        if duplicate_of is not None:
+                            # Processing took a reference to the shared file that no listing will hold
+                            if file_info.shared_file:
+                                release_shared_file(file_info.file_path)
+                            st.info(f"Skipping {uploaded_file.name}: same content as {duplicate_of.original_filename}")
+                            continue
                     
                     # Add to session state if successful
-                    if file_info and file_info.get("success"):
-                        newly_processed_files.append(file_info)
+                    if file_info and file_info.success:
+                        newly_processed_files.append(self._prepare_file_info(file_info))
                         st.success(f"Successfully processed: {uploaded_file.name}")
                     elif file_info:
                         # If text extraction failed, the 'error' might be in the text field
-                        error_msg = file_info.get('extracted_text') if isinstance(file_info.get('extracted_text'), str) and "Error" in file_info.get('extracted_text') else file_info.get('error', 'Unknown error')
+                        error_msg = file_info.extracted_text if file_info.extracted_text and "Error" in file_info.extracted_text else file_info.error or 'Unknown error'
                         st.error(f"Failed to process {uploaded_file.name}: {error_msg}")
                         # Still add file info so user sees the error message
-                        if not file_info.get("success"): # Ensure success is False
-                             file_info["success"] = False
-                        newly_processed_files.append(file_info)
+                        newly_processed_files.append(self._prepare_file_info(file_info))
                     else:
                          st.error(f"Failed to process {uploaded_file.name}: Processing returned no information.")
 
-                # Prepend newly processed files to the list so they appear first
-                st.session_state.uploaded_files = newly_processed_files + st.session_state.uploaded_files
+                # Prepend newly processed files so they appear first
+                uploaded = OrderedDict((f.saved_filename, f) for f in newly_processed_files)
+                uploaded.update(st.session_state.uploaded_files)
+                st.session_state.uploaded_files = uploaded
                 # Rerun to update the display immediately
                 st.experimental_rerun()
 
@@ -142,19 +233,22 @@ class UploadComponent:
             return
         
         st.header("Uploaded Materials")
+        st.markdown(_HIGHLIGHT_STYLE, unsafe_allow_html=True)
         
-        files_to_remove_indices = []
+        files_to_remove = []
+        # Segments whose players are shown in this run, so pending audio is only awaited for open readers
+        shown_segment_ids = []
 
-        for idx, file_info in enumerate(st.session_state.uploaded_files):
-            # Defensive check for file_info dictionary
-            if not isinstance(file_info, dict):
-                st.warning(f"Skipping invalid file entry at index {idx}.")
-                continue
+        # Neither changes during a render pass, so they are read once rather than per file
+        tts_component = st.session_state.get('tts_component')
+        currently_playing_segment_id = st.session_state.get('current_audio_segment_id')
+        if not tts_component:
+            st.warning("TTS is not available.")
 
-            # Ensure a unique and valid key for the expander using .get() with defaults
-            saved_fn = file_info.get('saved_filename', f'missing_fn_{idx}')
-            original_fn = file_info.get('original_filename', f'Unknown File {idx}')
-            file_type_upper = file_info.get('file_type', 'unknown').upper()
+        for idx, (saved_fn, file_info) in enumerate(st.session_state.uploaded_files.items()):
+            original_fn = file_info.original_filename
+            widget_keys = file_info.widget_keys
+            file_type_upper = file_info.file_type_upper
             
             expander_label = f"{original_fn} ({file_type_upper})"
 
@@ -165,66 +259,75 @@ class UploadComponent:
                     st.write(f"**File Type:** {file_type_upper}")
                     
                     # Display file preview based on type
-                    file_path = file_info.get('file_path')
-                    if file_info.get('file_type') == 'image' and file_path:
+                    file_path = file_info.file_path
+                    if file_info.file_type == 'image' and file_path:
                         st.image(file_path, caption=original_fn)
                     
                     # Display extracted text if available and successful
-                    extracted_text = file_info.get('extracted_text')
-                    is_extraction_error = isinstance(extracted_text, str) and ("Error" in extracted_text or "failed" in extracted_text.lower() or "not found" in extracted_text.lower())
+                    extracted_text = file_info.extracted_text
+                    is_extraction_error = file_info.is_extraction_error
                     
                     if extracted_text and not is_extraction_error:
                         st.subheader("Extracted Text (Full)")
-                        st.text_area("Full Content", value=extracted_text, height=200, key=f"full_text_{idx}_{saved_fn}")
+                        st.text_area("Full Content", value=extracted_text, height=200, key=widget_keys['full_text'])
                         
                         # --- Interactive Reader Section --- #
                         st.subheader("Interactive Reader")
-                        st.caption("Click the 🔊 button next to a paragraph to hear it read aloud.")
-
-                        # Use the improved segmentation method
-                        segments = self._segment_text(extracted_text)
+                        # Streamlit runs every expander body on each rerun, collapsed or not, so the
+                        # per-paragraph widgets are only built for readers the user has opened
+                        reader_open = st.checkbox("Open interactive reader", key=widget_keys['reader_open'])
 
-                        tts_component = st.session_state.get('tts_component')
-                        currently_playing_segment_id = st.session_state.get('current_audio_segment_id')
+                        # Segments were computed once when the file was processed
+                        segments = file_info.segments
 
-                        if not tts_component:
-                            st.warning("TTS is not available.")
+                        if not reader_open:
+                            st.caption("Open the reader to hear paragraphs read aloud.")
+                        elif not tts_component:
+                            st.caption("Reading aloud is unavailable without TTS.")
                         else:
                             if not segments:
                                 st.info("Could not segment text for interactive reading.")
                             else:
-                                for seg_idx, segment_text in enumerate(segments):
+                                st.caption("Click the 🔊 button with a paragraph's number (below the text) to hear it read aloud.")
+                                segment_keys = file_info.segment_keys
+                                # Queue every paragraph at once: the first plays as soon as it's ready
+                                # while the rest are generated in the background
+                                if st.button("🔊 Read all", key=widget_keys['read_all'], help="Generate audio for every paragraph"):
+                                    tts_component.enqueue_segments([(segment_id, seg_text) for (segment_id, _), seg_text in zip(segment_keys, segments)])
+                                    st.experimental_rerun()
+                                # All paragraph text goes to the frontend as one markdown element instead of
+                                # one element per paragraph; only the playback controls below are per segment
+                                paragraph_blocks = []
+                                for seg_idx, ((segment_id, _), segment_text) in enumerate(zip(segment_keys, segments)):
                                     if not segment_text: continue # Should be handled by _segment_text, but double-check
-                                    
-                                    segment_id = f"{saved_fn}_seg_{seg_idx}"
-                                    
-                                    # Display segment with potential highlighting
-                                    is_playing = (currently_playing_segment_id == segment_id)
-                                    if is_playing:
+                                    # Extracted text is escaped so markup in a document is shown, not rendered.
+                                    # Paragraphs are numbered to match their "🔊 N" buttons below.
+                                    numbered_text = f"<b>[{seg_idx+1}]</b> {html.escape(segment_text)}"
+                                    if currently_playing_segment_id == segment_id:
                                         # Use markdown for highlighting (simple background color)
-                                        st.markdown(f"<div style='background-color: #ffff99; padding: 5px; border-radius: 3px;'>{segment_text}</div>", unsafe_allow_html=True)
+                                        paragraph_blocks.append(f"<div class='tts-highlight'>{numbered_text}</div>")
                                     else:
-                                        st.write(segment_text)
-
-                                    # Add Play button and render audio player placeholder
-                                    button_col, player_col = st.columns([1, 5])
-                                    with button_col:
-                                        play_button_key = f"play_{segment_id}"
-                                        if st.button(f"🔊 Play", key=play_button_key, help="Read this paragraph aloud"):
-                                            tts_component.trigger_audio_generation_for_segment(segment_id)
-                                            st.experimental_rerun()
-                                    
-                                    with player_col:
-                                        # This will display the player if audio for this segment is ready
-                                        tts_component.render_audio_player_for_segment(segment_text, segment_id, source=f"Paragraph {seg_idx+1}")
-                                    
-                                    st.markdown("----") # Separator between segments
+                                        paragraph_blocks.append(numbered_text)
+                                st.markdown("\n\n----\n\n".join(paragraph_blocks), unsafe_allow_html=True)
+
+                                st.markdown("----")
+                                for seg_idx, ((segment_id, play_button_key), segment_text) in enumerate(zip(segment_keys, segments)):
+                                    if not segment_text: continue
+
+                                    # Play button and audio player in plain flow layout: a column pair per
+                                    # paragraph would add two layout containers per segment on every rerun
+                                    if st.button(f"🔊 {seg_idx+1}", key=play_button_key, help=f"Read paragraph {seg_idx+1} aloud"):
+                                        tts_component.trigger_audio_generation_for_segment(segment_id)
+                                        st.experimental_rerun()
+
+                                    # This will display the player if audio for this segment is ready
+                                    tts_component.render_audio_player_for_segment(segment_text, segment_id, source=f"Paragraph {seg_idx+1}")
+                                    shown_segment_ids.append(segment_id)
 
                         # --- End Interactive Reader Section --- #
 
                         # Add "Explain" button for this content (navigates to Lessons page)
-                        explain_button_key = f"explain_{idx}_{saved_fn}"
-                        if st.button(f"Explain this content", key=explain_button_key):
+                        if st.button(f"Explain this content", key=widget_keys['explain']):
                             st.session_state.content_to_explain = {
                                 'text': extracted_text, # Use the full extracted text
                                 'source': original_fn
@@ -236,32 +339,41 @@ class UploadComponent:
                     # Handle cases where text extraction failed or yielded no text
                     elif is_extraction_error:
                          st.error(f"Text Extraction Failed: {extracted_text}")
-                    elif file_info.get('file_type') != 'image': # Don't show 'no text' for images unless OCR failed
+                    elif file_info.file_type != 'image': # Don't show 'no text' for images unless OCR failed
                         st.warning("No text could be extracted from this file.")
                     
                     st.markdown("----")
                     # Option to remove file
-                    remove_button_key = f"remove_{idx}_{saved_fn}"
-                    if st.button(f"Remove File", key=remove_button_key):
-                        files_to_remove_indices.append(idx)
+                    if st.button(f"Remove File", key=widget_keys['remove']):
+                        files_to_remove.append(saved_fn)
                         # Defer actual removal and rerun until after the loop
             except Exception as e:
                  # Catch errors within the expander, provide more context
                  st.error(f"Error displaying file '{original_fn}' (Index: {idx}, Saved: {saved_fn}): {e}") 
 
         # Process removals after iterating
-        if files_to_remove_indices:
-            # Remove files from session state in reverse index order to avoid shifting issues
-            for index in sorted(files_to_remove_indices, reverse=True):
-                removed_file = st.session_state.uploaded_files.pop(index)
-                # Optionally, remove the actual file from disk
-                try:
-                    if removed_file and removed_file.get('file_path') and os.path.exists(removed_file['file_path']):
-                        os.remove(removed_file['file_path'])
+        if files_to_remove:
+            for saved_fn in files_to_remove:
+                removed_file = st.session_state.uploaded_files.pop(saved_fn)
+                # Drop the removed file's queued audio jobs so they don't run for nothing
+                if tts_component:
+                    tts_component.cancel_queued_segments([sid for sid, _ in removed_file.segment_keys or []])
+                # Content-addressed files are shared by identical uploads in every session, so
+                # they are only deleted once the last listing using them is removed
+                if removed_file.shared_file:
+                    if removed_file.file_path:
+                        release_shared_file(removed_file.file_path)
+                    continue
+                # Optionally, remove the actual file from disk. A file that is already gone is
+                # fine, so there is no separate (racy) existence check before removing it
+                if removed_file.file_path:
+                    try:
+                        with suppress(FileNotFoundError):
+                            os.remove(removed_file.file_path)
                         # Also try removing associated audio files if naming convention allows
                         # (This part is complex without a clear audio file naming strategy)
-                except OSError as e:
-                    st.warning(f"Could not remove file from disk: {e}")
+                    except OSError as e:
+                        st.warning(f"Could not remove file from disk: {e}")
             
             # Clear any audio state related to the removed file (difficult without tracking)
             # For simplicity, just clear the current audio state
@@ -272,12 +384,16 @@ class UploadComponent:
 
             st.experimental_rerun()
 
+        # Rerun once queued or requested audio is ready, so players appear on their own
+        if tts_component:
+            tts_component.rerun_when_audio_ready(shown_segment_ids)
+
     
-    def get_uploaded_files(self) -> List[Dict[str, Any]]:
+    def get_uploaded_files(self) -> List[UploadedFile]:
         """
         Get the list of uploaded files from session state.
         
         Returns:
-            List of dictionaries containing file information
+            List of UploadedFile objects, newest first
         """
-        return st.session_state.uploaded_files
+        return list(st.session_state.uploaded_files.values())
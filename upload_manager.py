@@ -4,11 +4,36 @@ Integrates all file type handlers and provides a unified interface.
 """
 import os
 import uuid
-from typing import Dict, Tuple, Optional
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple, Optional
 from image_handler import ImageHandler
 from pdf_handler import PDFHandler
 from docx_handler import DOCXHandler
 
+@dataclass(slots=True)
+class UploadedFile:
+    """
+    Information about one processed upload.
+
+    The trailing fields are derived display data filled in once by the upload
+    component (see UploadComponent._prepare_file_info); segments is None until then.
+    """
+    original_filename: str
+    saved_filename: str
+    file_type: str
+    file_path: Optional[str] = None
+    extracted_text: Optional[str] = None
+    success: bool = False
+    error: Optional[str] = None
+    # Content-addressed file that identical uploads (in any session) share; never deleted on remove
+    shared_file: bool = False
+    file_type_upper: str = field(default="", repr=False)
+    is_extraction_error: bool = field(default=False, repr=False)
+    segments: Optional[List[str]] = field(default=None, repr=False)
+    # (segment_id, play button key) per segment and the file's own widget keys
+    segment_keys: Optional[List[Tuple[str, str]]] = field(default=None, repr=False)
+    widget_keys: Optional[Dict[str, str]] = field(default=None, repr=False)
+
 class UploadManager:
     """
     Unified manager for handling various file uploads.
@@ -30,7 +55,7 @@ class UploadManager:
         self.pdf_handler = PDFHandler(os.path.join(base_upload_folder, "pdfs"))
         self.docx_handler = DOCXHandler(os.path.join(base_upload_folder, "docx"))
     
-    def process_upload(self, file, original_filename: str) -> Dict:
+    def process_upload(self, file, original_filename: str) -> UploadedFile:
         """
         Process an uploaded file based on its extension.
         
@@ -39,47 +64,47 @@ class UploadManager:
             original_filename: Original name of the uploaded file
             
         Returns:
-            Dictionary containing file information and extracted text
+            UploadedFile containing file information and extracted text
         """
         # Generate a unique filename to prevent collisions
         file_ext = os.path.splitext(original_filename)[1].lower()
         unique_filename = f"{uuid.uuid4().hex}{file_ext}"
         
-        file_info = {
-            "original_filename": original_filename,
-            "saved_filename": unique_filename,
-            "file_type": file_ext.lstrip('.'),
-            "file_path": None,
-            "extracted_text": None,
-            "success": False,
-            "error": None
-        }
+        file_info = UploadedFile(
+            original_filename=original_filename,
+            saved_filename=unique_filename,
+            file_type=file_ext.lstrip('.'),
+        )
         
         try:
             # Process based on file extension
             if file_ext.lower() in ['.jpg', '.jpeg', '.png']:
                 file_path, extracted_text = self.image_handler.process_image(file, unique_filename)
-                file_info["file_type"] = "image"
+                file_info.file_type = "image"
+                file_info.shared_file = True
             
             elif file_ext.lower() == '.pdf':
                 file_path, extracted_text = self.pdf_handler.process_pdf(file, unique_filename)
-                file_info["file_type"] = "pdf"
+                file_info.file_type = "pdf"
             
             elif file_ext.lower() == '.docx':
                 file_path, extracted_text = self.docx_handler.process_docx(file, unique_filename)
-                file_info["file_type"] = "docx"
+                file_info.file_type = "docx"
+                file_info.shared_file = True
             
             else:
-                file_info["error"] = f"Unsupported file type: {file_ext}"
+                file_info.error = f"Unsupported file type: {file_ext}"
                 return file_info
             
-            # Update file info with results
-            file_info["file_path"] = file_path
-            file_info["extracted_text"] = extracted_text
-            file_info["success"] = True
+            # Update file info with results. Handlers may store the file under a different
+            # (content-addressed) name, so saved_filename records the name actually on disk.
+            file_info.file_path = file_path
+            file_info.saved_filename = os.path.basename(file_path)
+            file_info.extracted_text = extracted_text
+            file_info.success = True
             
         except Exception as e:
-            file_info["error"] = str(e)
+            file_info.error = str(e)
         
         return file_info
     
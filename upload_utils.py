@@ -0,0 +1,142 @@
+"""
+Shared helpers for the upload handlers.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import suppress
+from typing import Dict, Optional
+
+# Uploads are streamed to disk in chunks of this size instead of read into memory
+COPY_BUFFER_SIZE = 1024 * 1024
+# hashlib algorithm used for content-addressed uploads and caches
+DIGEST_ALGORITHM = "blake2b"
+# Extracted texts kept per handler class, keyed by content digest
+TEXT_CACHE_SIZE = 256
+
+class TextCache:
+    """
+    Small thread-safe LRU cache of content digest -> extracted text.
+    """
+
+    def __init__(self, maxsize: int):
+        """
+        Initialize the cache.
+
+        Args:
+            maxsize: Maximum number of entries before the least recently used is evicted
+        """
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, digest: str) -> Optional[str]:
+        """Return the cached text for a digest, or None if missing."""
+        with self._lock:
+            text = self._data.get(digest)
+            if text is not None:
+                self._data.move_to_end(digest)
+            return text
+
+    def set(self, digest: str, text: str) -> None:
+        """Store the text for a digest, evicting the least recently used entry if full."""
+        with self._lock:
+            self._data[digest] = text
+            self._data.move_to_end(digest)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+# Content-addressed path -> number of upload listings (in any session) that use the file
+_shared_refs: Dict[str, int] = {}
+# Guards _shared_refs together with the existence check and the final delete of a shared file
+_shared_refs_lock = threading.Lock()
+
+def claim_shared_file(file, file_path: str) -> bool:
+    """
+    Count a reference to a content-addressed file, saving the upload there if it is missing.
+
+    The file is written to a temporary name and moved into place, so a session reading an
+    existing copy never sees it truncated. The reference is counted even if saving fails,
+    so the caller's listing releases it either way.
+
+    Args:
+        file: A binary file-like object or a path on disk
+        file_path: Content-addressed destination path
+
+    Returns:
+        True if the file was written, False if an identical file was already there
+    """
+    with _shared_refs_lock:
+        _shared_refs[file_path] = _shared_refs.get(file_path, 0) + 1
+        if os.path.exists(file_path):
+            return False
+
+    temp_path = None
+    try:
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(file_path), suffix=".part")
+        with os.fdopen(fd, "wb", buffering=COPY_BUFFER_SIZE) as f:
+            if hasattr(file, "read"):
+                shutil.copyfileobj(file, f, length=COPY_BUFFER_SIZE)
+            else:
+                with open(file, "rb") as src:
+                    shutil.copyfileobj(src, f, length=COPY_BUFFER_SIZE)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if temp_path is not None:
+            with suppress(OSError):
+                os.unlink(temp_path)
+        raise
+    return True
+
+def release_shared_file(file_path: str) -> None:
+    """
+    Drop a reference taken by claim_shared_file, deleting the file with its last reference.
+
+    Args:
+        file_path: Content-addressed path passed to claim_shared_file
+    """
+    with _shared_refs_lock:
+        count = _shared_refs.get(file_path, 0) - 1
+        if count > 0:
+            _shared_refs[file_path] = count
+            return
+        _shared_refs.pop(file_path, None)
+        with suppress(FileNotFoundError):
+            os.remove(file_path)
+
+def content_digest(file) -> str:
+    """
+    Compute a BLAKE2b digest of an upload without reading it all into memory.
+
+    Args:
+        file: A binary file-like object (rewound before and after hashing) or a path on disk
+
+    Returns:
+        Hex digest of the file contents
+    """
+    if not hasattr(file, "read"):
+        with open(file, "rb") as f:
+            return hashlib.file_digest(f, DIGEST_ALGORITHM).hexdigest()
+
+    if hasattr(file, "seek"):
+        file.seek(0)
+    digest = hashlib.file_digest(file, DIGEST_ALGORITHM).hexdigest()
+    if hasattr(file, "seek"):
+        file.seek(0)
+    return digest
+
+def digest_filename(digest: str, filename: str) -> str:
+    """
+    Build a content-addressed file name, so identical uploads map to the same path.
+
+    Args:
+        digest: Hex digest of the file contents
+        filename: Original or generated file name, used for its extension
+
+    Returns:
+        File name made of the digest prefix and the original extension
+    """
+    return f"{digest[:16]}{os.path.splitext(filename)[1].lower()}"